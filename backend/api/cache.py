@@ -0,0 +1,50 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from recipes.models import Favorite, ShoppingCart
+
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+USER_RECIPES_CACHE_TIMEOUT = 60 * 60
+USER_RECIPES_MODELS = {
+    'favorite_ids': Favorite,
+    'shopping_cart_ids': ShoppingCart,
+}
+
+
+def get_user_recipes_key(user_id, kind):
+    version_key = f'user:{user_id}:{kind}:version'
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+    return f'user:{user_id}:{kind}:{version}'
+
+
+def get_user_recipe_ids(request, kind):
+    if not hasattr(request, kind):
+        user = request.user
+        recipe_ids = frozenset()
+        if user.is_authenticated:
+            key = get_user_recipes_key(user.id, kind)
+            recipe_ids = cache.get(key)
+            if recipe_ids is None:
+                recipe_ids = frozenset(
+                    USER_RECIPES_MODELS[kind].objects.filter(user=user)
+                    .values_list('recipe_id', flat=True)
+                )
+                cache.set(key, recipe_ids, USER_RECIPES_CACHE_TIMEOUT)
+        setattr(request, kind, recipe_ids)
+    return getattr(request, kind)
+
+
+def bump_user_recipes_version(user_id, kind):
+    version_key = f'user:{user_id}:{kind}:version'
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, time.time_ns(), timeout=None)
+
+
+def invalidate_user_recipe_ids(user_id, kind):
+    transaction.on_commit(lambda: bump_user_recipes_version(user_id, kind))
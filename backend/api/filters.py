@@ -1,6 +1,29 @@
 import django_filters as filters
-from recipes.models import Recipe, Tag
-from rest_framework.filters import SearchFilter
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db.models import Exists, F, OuterRef, Q
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from rest_framework.exceptions import ValidationError
+
+RECIPE_ORDERINGS = {
+    'favorites_count': ('favorites_count', 'pub_date', 'id'),
+    '-favorites_count': ('-favorites_count', '-pub_date', '-id'),
+    'pub_date': ('pub_date', 'id'),
+    '-pub_date': ('-pub_date', '-id'),
+    'trending': ('trending__rank',),
+}
+
+
+def parse_ids(value, name):
+    try:
+        ids = sorted({int(item) for item in value.split(',') if item.strip()})
+    except ValueError:
+        raise ValidationError(
+            {name: 'Ожидается список id через запятую.'}
+        )
+    if not ids:
+        raise ValidationError({name: 'Укажите хотя бы один id.'})
+    return ids
 
 
 class RecipeFilter(filters.FilterSet):
@@ -9,33 +32,81 @@ class RecipeFilter(filters.FilterSet):
         field_name="tags__slug",
         to_field_name="slug",
         queryset=Tag.objects.all(),
+        method='get_tags',
     )
     is_favorited = filters.CharFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.CharFilter(
         method='get_is_in_shopping_cart',
     )
+    search = filters.CharFilter(method='get_search')
+    ingredients = filters.CharFilter(method='get_ingredients')
+    exclude_ingredients = filters.CharFilter(
+        method='get_exclude_ingredients'
+    )
+    ordering = filters.CharFilter(method='get_ordering')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart', 'search',
+            'ingredients', 'exclude_ingredients', 'ordering'
+        )
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(tag_ids__overlap=[tag.id for tag in value])
 
     def get_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if value == '1':
-            return queryset.filter(favorite__user=user)
-        if value == '0':
-            return queryset.exclude(favorite__user=user)
-        return queryset
+        return self.filter_by_user_recipes(queryset, Favorite, value)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_by_user_recipes(queryset, ShoppingCart, value)
+
+    def filter_by_user_recipes(self, queryset, model, value):
+        if value not in ('0', '1'):
+            return queryset
         user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none() if value == '1' else queryset
+        in_user_recipes = Exists(
+            model.objects.filter(user=user, recipe=OuterRef('pk'))
+        )
         if value == '1':
-            return queryset.filter(in_shoppingcard__user=user)
-        if value == '0':
-            return queryset.exclude(in_shoppingcard__user=user)
-        return queryset
+            return queryset.filter(in_user_recipes)
+        return queryset.filter(~in_user_recipes)
+
+    def get_ingredients(self, queryset, name, value):
+        return queryset.filter(
+            ingredient_ids__contains=parse_ids(value, name)
+        )
 
+    def get_exclude_ingredients(self, queryset, name, value):
+        return queryset.exclude(
+            ingredient_ids__overlap=parse_ids(value, name)
+        )
 
-class IngredientFilter(SearchFilter):
+    def get_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        query = SearchQuery(value, config='russian', search_type='websearch')
+        return queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_similar=value)
+        ).annotate(
+            rank=(SearchRank(F('search_vector'), query)
+                  + TrigramSimilarity('name', value))
+        ).order_by('-rank', '-pub_date')
 
-    search_param = 'name'
+    def get_ordering(self, queryset, name, value):
+        if value not in RECIPE_ORDERINGS:
+            raise ValidationError({'ordering': (
+                f'Допустимые значения: {", ".join(RECIPE_ORDERINGS)}'
+            )})
+        if value == 'trending':
+            tags = self.form.cleaned_data.get('tags') or []
+            queryset = queryset.filter(
+                trending__rank__isnull=False,
+                trending__tag=tags[0] if len(tags) == 1 else None
+            )
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
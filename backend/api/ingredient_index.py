@@ -0,0 +1,44 @@
+import bisect
+import threading
+
+from recipes.catalog import get_catalog_version
+from recipes.models import Ingredient
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientPrefixIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get_index(self):
+        version = get_catalog_version()
+        index = self._index
+        if index is None or index[0] != version:
+            with self._lock:
+                if self._index is None or self._index[0] != version:
+                    ingredients = sorted(
+                        Ingredient.objects.all(),
+                        key=lambda item: (normalize(item.name), item.id)
+                    )
+                    self._index = (
+                        version,
+                        [normalize(item.name) for item in ingredients],
+                        ingredients
+                    )
+                index = self._index
+        return index
+
+    def search(self, prefix=''):
+        _, keys, ingredients = self.get_index()
+        prefix = normalize(prefix.strip())
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + chr(0x10FFFF), lo=start)
+        return ingredients[start:end]
+
+
+ingredient_index = IngredientPrefixIndex()
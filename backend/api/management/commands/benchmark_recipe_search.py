@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from recipes.catalog import iter_batches
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.transfer import RecipeImporter
+from users.models import User
+
+from api.filters import RecipeFilter
+
+SEED_BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ('Замеряет поиск рецептов через ?search= и выводит план '
+            'запроса (EXPLAIN ANALYZE).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='+', help='Поисковые запросы.')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнить каждый запрос.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=6,
+            help='Размер страницы выдачи.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Предварительно создать столько синтетических рецептов.'
+        )
+        parser.add_argument(
+            '--author', help='Email автора синтетических рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'], options['author'])
+        for term in options['terms']:
+            self.benchmark(term, term, options)
+            typo = make_typo(term)
+            if typo != term:
+                self.benchmark(typo, f'{term} (опечатка: {typo})', options)
+
+    def benchmark(self, term, title, options):
+        queryset = RecipeFilter(
+            {'search': term}, queryset=Recipe.objects.all()
+        ).qs[:options['limit']]
+        self.stdout.write(f'--- {title}')
+        self.stdout.write(queryset.explain(analyze=True))
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(self.style.SUCCESS(
+            f'медиана {statistics.median(timings):.2f} мс, '
+            f'максимум {max(timings):.2f} мс'
+        ))
+
+    def seed(self, count, author_email):
+        authors = User.objects.order_by('id')
+        if author_email:
+            authors = authors.filter(email=author_email)
+        author = authors.first()
+        if author is None:
+            raise CommandError('Не найден автор для синтетических рецептов.')
+        ingredients = list(
+            Ingredient.objects.values('name', 'measurement_unit')
+        )
+        if not ingredients:
+            raise CommandError('Справочник ингредиентов пуст.')
+        words = [ingredient['name'] for ingredient in ingredients]
+        slugs = list(Tag.objects.values_list('slug', flat=True))
+        pub_date = timezone.now().isoformat()
+        records = (
+            {
+                'name': ' '.join(random.sample(words, 2))[:50],
+                'description': ' '.join(random.sample(words, 12)),
+                'cooking_time': random.randint(1, 180),
+                'pub_date': pub_date,
+                'author': author.email,
+                'image': '',
+                'tags': random.sample(slugs, min(len(slugs), 2)),
+                'ingredients': [
+                    dict(ingredient, amount=random.randint(1, 500))
+                    for ingredient in random.sample(ingredients, 6)
+                ],
+            }
+            for _ in range(count)
+        )
+        importer = RecipeImporter(load_image=None, follow_up_jobs=False)
+        for batch in iter_batches(records, SEED_BATCH_SIZE):
+            imported, _ = importer.run(batch)
+            self.stdout.write(f'Создано синтетических рецептов: {imported}')
+
+
+def make_typo(term):
+    word = max(term.split(), key=len, default='')
+    if len(word) < 4:
+        return term
+    chars = list(word)
+    middle = len(chars) // 2
+    chars[middle - 1], chars[middle] = chars[middle], chars[middle - 1]
+    return term.replace(word, ''.join(chars), 1)
@@ -1,8 +1,100 @@
-from rest_framework import mixins, viewsets
+import hashlib
 
+from django.core.cache import cache
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from recipes.catalog import get_catalog_version
+from recipes.models import Recipe
+from rest_framework import status
+from rest_framework.response import Response
 
-class CreateDestroyViewSet(mixins.CreateModelMixin,
-                           mixins.DestroyModelMixin,
-                           viewsets.GenericViewSet):
+from .cache import (CATALOG_CACHE_TIMEOUT, USER_RECIPES_MODELS,
+                    invalidate_user_recipe_ids)
+from .serializers import SpecialRecipeSerializer
 
-    pass
+USER_RECIPES_ERRORS = {
+    'favorite_ids': (
+        'Рецепт уже в избранном',
+        'Рецепт не был добавлен ранее в избранное',
+    ),
+    'shopping_cart_ids': (
+        'Вы уже добавили рецепт в список покупок',
+        'Рецепт не был добавлен в список покупок',
+    ),
+}
+
+
+class UserRecipesMixin:
+
+    def change_user_recipes(self, request, kind, recipe_id):
+        user_id = request.user.id
+        adding = request.method == 'POST'
+        objects = USER_RECIPES_MODELS[kind].objects
+        with transaction.atomic():
+            if adding:
+                changed = objects.add_recipe(user_id, recipe_id)
+            else:
+                changed = objects.remove_recipe(user_id, recipe_id)
+        if not changed:
+            get_object_or_404(Recipe.objects.values('id'), id=recipe_id)
+            already_added, not_added = USER_RECIPES_ERRORS[kind]
+            return Response(
+                {'errors': already_added if adding else not_added},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        invalidate_user_recipe_ids(user_id, kind)
+        if not adding:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        recipe = Recipe(**get_object_or_404(
+            Recipe.objects.values(*SpecialRecipeSerializer.Meta.fields,
+                                  'image_variants'),
+            id=recipe_id
+        ))
+        serializer = SpecialRecipeSerializer(
+            recipe, context={'request': request}
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class CatalogCacheMixin:
+
+    authentication_classes = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+    def get_cached_response(self, request, handler, *args, **kwargs):
+        version = get_catalog_version()
+        last_modified = version // 1_000_000
+        headers = {
+            'ETag': f'"{version}"',
+            'Last-Modified': http_date(last_modified),
+        }
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or headers['ETag'] in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED,
+                                headers=headers)
+        else:
+            if_modified_since = parse_http_date_safe(
+                request.headers.get('If-Modified-Since')
+            )
+            if if_modified_since and if_modified_since >= last_modified:
+                return Response(status=status.HTTP_304_NOT_MODIFIED,
+                                headers=headers)
+        path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = f'catalog:{version}:{path_hash}'
+        data = cache.get(key)
+        if data is None:
+            data = handler(request, *args, **kwargs).data
+            cache.set(key, data, CATALOG_CACHE_TIMEOUT)
+        return Response(data, headers=headers)
@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+PDF_FONT_NAME = 'DejaVuSans'
+PDF_FONT_PATH = settings.BASE_DIR / 'data' / 'fonts' / 'DejaVuSans.ttf'
+PDF_FONT_SIZE = 11
+PDF_LEADING = 16
+PDF_MARGIN = 20 * mm
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+class TextShoppingCartRenderer(BaseRenderer):
+
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data)
+
+    def stream(self, rows):
+        for row in rows:
+            yield f'{row["name"]}: {row["total"]} {row["unit"]}\n'
+
+
+class CSVShoppingCartRenderer(TextShoppingCartRenderer):
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            writer.writerow((row['name'], row['unit'], row['total']))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+class JSONShoppingCartRenderer(JSONRenderer):
+
+    charset = 'utf-8'
+
+    def stream(self, rows):
+        separator = '['
+        for row in rows:
+            yield separator + json.dumps(
+                {
+                    'name': row['name'],
+                    'measurement_unit': row['unit'],
+                    'amount': row['total'],
+                },
+                ensure_ascii=False
+            )
+            separator = ','
+        yield '[]' if separator == '[' else ']'
+
+
+class PDFShoppingCartRenderer(BaseRenderer):
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            lines = [f'{key}: {value}' for key, value in data.items()]
+        else:
+            lines = [str(data)]
+        return b''.join(self.build(lines))
+
+    def stream(self, rows):
+        return self.build(
+            f'{row["name"]}: {row["total"]} {row["unit"]}' for row in rows
+        )
+
+    def build(self, lines):
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, PDF_FONT_PATH))
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        top = height - PDF_MARGIN
+        y = top
+        pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+        for line in lines:
+            for part in simpleSplit(line, PDF_FONT_NAME, PDF_FONT_SIZE,
+                                    width - 2 * PDF_MARGIN):
+                if y < PDF_MARGIN:
+                    pdf.showPage()
+                    pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+                    y = top
+                pdf.drawString(PDF_MARGIN, y, part)
+                y -= PDF_LEADING
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+
+class NDJSONRenderer(BaseRenderer):
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False)
+
+    def stream(self, records):
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
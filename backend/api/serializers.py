@@ -1,24 +1,85 @@
-from django.contrib.auth.models import AnonymousUser
+import base64
+import binascii
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.db import transaction
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
-from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                            ShoppingCart, Subscription, Tag, TagRecipe)
+from recipes.images import IMAGE_FORMATS, inspect_image
+from recipes.jobs import enqueue_job, schedule_image_processing
+from recipes.models import (Ingredient, IngredientAmount, Recipe,
+                            ShoppingListItem, Subscription, Tag, TagRecipe)
 from rest_framework import serializers
 from users.models import User
 
+from .cache import get_user_recipe_ids
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        variants = {}
+        for name, variant in value.items():
+            variants[name] = dict(variant)
+            for extension in IMAGE_FORMATS:
+                url = default_storage.url(variant[extension])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[name][extension] = url
+        return variants
+
+
+class HashedBase64ImageField(Base64ImageField):
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} байт.',
+        'invalid_base64': 'Изображение должно быть закодировано в base64.',
+    }
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            self.fail('invalid_base64')
+        encoded = base64_data.split(';base64,')[-1]
+        if len(encoded) * 3 // 4 > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        try:
+            content = base64.b64decode(encoded)
+        except (binascii.Error, ValueError):
+            self.fail('invalid_base64')
+        try:
+            extension = inspect_image(content)
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+        return ContentFile(
+            content, name=hashlib.sha256(content).hexdigest() + extension
+        )
 
-class CustomUserSerializer(UserSerializer):
 
-    is_subscribed = serializers.SerializerMethodField('check_if_is_subscribed')
+class SubscriptionStatusMixin:
 
     def check_if_is_subscribed(self, obj):
-        current_user = self.context.get('request').user
-        if not current_user or isinstance(current_user, AnonymousUser):
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return False
+        if obj.pk == request.user.pk:
             return False
-        return Subscription.objects.filter(
-            subscriber=current_user, author=obj
-        ).exists()
+        if not hasattr(request, 'subscribed_ids'):
+            request.subscribed_ids = set(
+                Subscription.objects.filter(subscriber=request.user)
+                .values_list('author_id', flat=True)
+            )
+        return obj.pk in request.subscribed_ids
+
+
+class CustomUserSerializer(SubscriptionStatusMixin, UserSerializer):
+
+    is_subscribed = serializers.SerializerMethodField('check_if_is_subscribed')
 
     class Meta:
         model = User
@@ -67,8 +128,23 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = CustomUserSerializer()
     ingredients = IngredientAmountSerializer(source='ingredientrec', many=True)
-    is_in_shopping_cart = serializers.BooleanField(read_only=True)
-    is_favorited = serializers.BooleanField(read_only=True)
+    image_variants = ImageVariantsField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+    is_favorited = serializers.SerializerMethodField()
+
+    def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return obj.pk in get_user_recipe_ids(
+            self.context['request'], 'favorite_ids'
+        )
+
+    def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return obj.pk in get_user_recipe_ids(
+            self.context['request'], 'shopping_cart_ids'
+        )
 
     class Meta:
         model = Recipe
@@ -79,13 +155,28 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
             'ingredients',
             'name',
             'image',
+            'image_variants',
+            'image_placeholder',
             'text',
             'cooking_time',
+            'favorites_count',
             'is_favorited',
             'is_in_shopping_cart'
         )
 
 
+class PantryRecipeSerializer(ReadRecipeSerializer):
+    matched_count = serializers.IntegerField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ReadRecipeSerializer.Meta):
+        fields = (
+            *ReadRecipeSerializer.Meta.fields,
+            'matched_count',
+            'missing_count'
+        )
+
+
 class WriteIngredientAmountSerializer(serializers.ModelSerializer):
 
     id = serializers.IntegerField(source='ingredient')
@@ -104,12 +195,27 @@ class WriteRecipeSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all()
     )
-    image = Base64ImageField()
+    image = HashedBase64ImageField()
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
     is_favorited = serializers.BooleanField(read_only=True)
 
-    @transaction.atomic
-    def create(self, validated_data):
+    def validate_ingredients(self, value):
+        ingredient_ids = [item['ingredient'] for item in value]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться.'
+            )
+        ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        missing_ids = sorted(set(ingredient_ids) - ingredients.keys())
+        if missing_ids:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {missing_ids}'
+            )
+        for item in value:
+            item['ingredient'] = ingredients[item['ingredient']]
+        return value
+
+    def pop_relations(self, validated_data):
         try:
             ingredients = validated_data.pop('ingredientrec')
         except KeyError:
@@ -122,67 +228,120 @@ class WriteRecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'errors': 'Теги отсутствуют в запросе.'}
             )
-        recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
-        create_ingredients = [
+        return ingredients, tags
+
+    @transaction.atomic
+    def create(self, validated_data):
+        ingredients, tags = self.pop_relations(validated_data)
+        image = validated_data.pop('image')
+        tags = list(dict.fromkeys(tags))
+        recipe = Recipe(
+            **validated_data,
+            ingredient_ids=sorted(
+                ingredient['ingredient'].id for ingredient in ingredients
+            ),
+            tag_ids=sorted(tag.id for tag in tags)
+        )
+        self.assign_image(recipe, image)
+        recipe.save()
+        TagRecipe.objects.bulk_create(
+            [TagRecipe(recipe=recipe, tag=tag) for tag in tags]
+        )
+        amounts = IngredientAmount.objects.bulk_create([
             IngredientAmount(
                 recipe=recipe,
-                ingredient=Ingredient.objects.get(
-                    id=ingredient.get('ingredient')
-                ),
-                amount=ingredient.get('amount')
+                ingredient=ingredient['ingredient'],
+                amount=ingredient['amount']
             )
             for ingredient in ingredients
-        ]
-        IngredientAmount.objects.bulk_create(create_ingredients)
+        ])
+        schedule_image_processing(recipe)
+        enqueue_job('update_similar_recipes', recipe_id=recipe.pk)
+        recipe.is_favorited = False
+        recipe.is_in_shopping_cart = False
+        self.cache_relations(tags, amounts)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        try:
-            ingredients = validated_data.pop('ingredientrec')
-        except KeyError:
-            raise serializers.ValidationError(
-                {'errors': 'Ингредиенты отсутствуют в запросе.'}
-            )
-        try:
-            tags = validated_data.pop('tags')
-        except KeyError:
-            raise serializers.ValidationError(
-                {'errors': 'Теги отсутствуют в запросе.'}
+        ingredients, tags = self.pop_relations(validated_data)
+        existing = {}
+        old_amounts = {}
+        delete_ids = []
+        for amount in instance.ingredientrec.all():
+            old_amounts[amount.ingredient_id] = (
+                old_amounts.get(amount.ingredient_id, 0) + amount.amount
             )
-        TagRecipe.objects.filter(recipe=instance).delete()
-        IngredientAmount.objects.filter(recipe=instance).delete()
-        create_ingredients = [
-            IngredientAmount(
-                recipe=instance,
-                ingredient=Ingredient.objects.get(
-                    id=ingredient.get('ingredient')
-                ),
-                amount=ingredient.get('amount')
+            if amount.ingredient_id in existing:
+                delete_ids.append(amount.pk)
+            else:
+                existing[amount.ingredient_id] = amount
+        new_amounts = {}
+        amounts = []
+        create_ingredients = []
+        update_ingredients = []
+        for ingredient in ingredients:
+            new_amounts[ingredient['ingredient'].id] = ingredient['amount']
+            current = existing.pop(ingredient['ingredient'].id, None)
+            if current is None:
+                current = IngredientAmount(
+                    recipe=instance,
+                    ingredient=ingredient['ingredient'],
+                    amount=ingredient['amount']
+                )
+                create_ingredients.append(current)
+            elif current.amount != ingredient['amount']:
+                current.amount = ingredient['amount']
+                update_ingredients.append(current)
+            current.ingredient = ingredient['ingredient']
+            amounts.append(current)
+        delete_ids.extend(amount.pk for amount in existing.values())
+        if delete_ids:
+            IngredientAmount.objects.filter(pk__in=delete_ids).delete()
+        if update_ingredients:
+            IngredientAmount.objects.bulk_update(
+                update_ingredients, ['amount']
             )
-            for ingredient in ingredients
-        ]
         IngredientAmount.objects.bulk_create(create_ingredients)
+        ShoppingListItem.objects.change_recipe(
+            instance.id, old_amounts, new_amounts
+        )
         instance.name = validated_data.pop('name')
         instance.description = validated_data.pop('description')
         instance.cooking_time = validated_data.pop('cooking_time')
-        try:
-            instance.image = validated_data.pop('image')
-        except KeyError:
-            instance.image = instance.image
+        ingredients_changed = instance.ingredient_ids != sorted(new_amounts)
+        instance.ingredient_ids = sorted(new_amounts)
+        instance.tag_ids = sorted({tag.id for tag in tags})
+        image_changed = 'image' in validated_data
+        if image_changed:
+            self.assign_image(instance, validated_data.pop('image'))
         instance.tags.set(tags)
         instance.save()
+        if image_changed:
+            schedule_image_processing(instance)
+        if ingredients_changed:
+            enqueue_job('update_similar_recipes', recipe_id=instance.pk)
+        self.cache_relations(tags, amounts)
         return instance
 
+    def assign_image(self, recipe, image):
+        recipe.image_hash = Path(image.name).stem
+        stored = (
+            Recipe.objects.filter(image_hash=recipe.image_hash)
+            .exclude(pk=recipe.pk).values_list('image', flat=True).first()
+        )
+        recipe.image = stored or image
+
+    def cache_relations(self, tags, amounts):
+        self.written_relations = {
+            'tags': tags,
+            'ingredientrec': amounts,
+        }
+
     def to_representation(self, instance):
-        user_id = self.context['request'].user.id
-        instance = (Recipe.objects.add_user_annotations(user_id=user_id)
-                    .get(id=instance.id))
-        return ReadRecipeSerializer(
-            instance,
-            context={
-                'request': self.context.get('request')
-            }).data
+        if hasattr(self, 'written_relations'):
+            instance._prefetched_objects_cache = self.written_relations
+        return ReadRecipeSerializer(instance, context=self.context).data
 
     class Meta:
         model = Recipe
@@ -233,53 +392,43 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 
 class SpecialRecipeSerializer(serializers.ModelSerializer):
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
+            'image_placeholder',
             'cooking_time'
         )
         read_only_fields = (
             'id',
             'name',
             'image',
+            'image_placeholder',
             'cooking_time'
         )
 
 
-class ShowFollowerSerializer(serializers.ModelSerializer):
+class ShowFollowerSerializer(SubscriptionStatusMixin,
+                             serializers.ModelSerializer):
 
     is_subscribed = serializers.SerializerMethodField('check_if_is_subscribed')
-    recipes_count = serializers.SerializerMethodField('get_recipes_count')
     recipes = serializers.SerializerMethodField('get_recipes')
 
     def get_recipes(self, obj):
-        recipes_limit_default = 6
-        recipes_limit = None
-        try:
-            recipes_limit = int(self.context.get('recipes_limit'))
-        except TypeError:
-            recipes_limit = recipes_limit_default
-        except ValueError:
-            recipes_limit = recipes_limit_default
-        if not recipes_limit:
-            recipes = obj.recipe_author.all()
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
         else:
-            recipes = obj.recipe_author.all()[:recipes_limit]
-        return SpecialRecipeSerializer(recipes, many=True, read_only=True).data
-
-    def check_if_is_subscribed(self, obj):
-        current_user = self.context.get('current_user')
-        if current_user is None:
-            return False
-        return Subscription.objects.filter(
-            subscriber=obj, author=current_user
-        ).exists()
-
-    def get_recipes_count(self, obj):
-        return obj.recipe_author.count()
+            recipes = obj.recipe_author.all()[
+                :self.context.get('recipes_limit')
+            ]
+        return SpecialRecipeSerializer(
+            recipes, many=True, read_only=True, context=self.context
+        ).data
 
     class Meta:
         model = User
@@ -293,68 +442,3 @@ class ShowFollowerSerializer(serializers.ModelSerializer):
             'recipes',
             'recipes_count'
         )
-
-
-class FavoriteSerializer(serializers.ModelSerializer):
-
-    def to_representation(self, obj):
-        recipe = Recipe.objects.get(id=obj.recipe.id)
-        return SpecialRecipeSerializer(recipe, context=self.context).data
-
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-
-    def validate(self, data):
-        recipe = data.get('recipe')
-        user = data.get('user')
-        shopping_cart = ShoppingCart.objects.filter(user=user, recipe=recipe)
-        if shopping_cart.exists() and self.context.method == 'POST':
-            raise serializers.ValidationError(
-                {'errors': 'Вы уже добавили рецепт в список покупок'}
-            )
-        if not shopping_cart.exists() and self.context.method == 'DELETE':
-            raise serializers.ValidationError(
-                {'errors': 'Рецепт не был добавлен в список покупок'}
-            )
-        return data
-
-    def to_representation(self, obj):
-        recipe = Recipe.objects.get(id=obj.recipe.id)
-        return SpecialRecipeSerializer(recipe, many=False, read_only=True).data
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
-
-
-class FavoriteRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.ReadOnlyField(
-        source='recipe.id',
-        read_only=True,
-    )
-    name = serializers.ReadOnlyField(
-        source='recipe.name',
-        read_only=True,
-    )
-    image = Base64ImageField(read_only=True, source='recipe.image',)
-    cooking_time = serializers.ReadOnlyField(
-        source='recipe.cooking_time',
-        read_only=True,
-    )
-
-    def validate(self, data):
-        user = self.context.get('request').user
-        recipe = self.context.get('recipe_id')
-        if Favorite.objects.filter(user=user,
-                                   recipe=recipe).exists():
-            raise serializers.ValidationError({
-                'errors': 'Рецепт уже в избранном'})
-        return data
-
-    class Meta:
-        model = Favorite
-        fields = ('id', 'name', 'image', 'cooking_time')
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import Favorite, ShoppingCart
+
+from .cache import invalidate_user_recipe_ids
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def invalidate_favorite_ids(sender, instance, **kwargs):
+    invalidate_user_recipe_ids(instance.user_id, 'favorite_ids')
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_shopping_cart_ids(sender, instance, **kwargs):
+    invalidate_user_recipe_ids(instance.user_id, 'shopping_cart_ids')
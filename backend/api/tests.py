@@ -0,0 +1,376 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from recipes.images import IMAGE_FORMATS
+from recipes.models import (BackgroundJob, Favorite, Ingredient,
+                            IngredientAmount, Recipe, ShoppingCart,
+                            Subscription, Tag, TimelineEntry)
+from rest_framework.test import APITestCase
+from users.models import User
+
+from .cache import get_user_recipe_ids, get_user_recipes_key
+from .filters import RecipeFilter
+
+
+class QueryCountTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}',
+                first_name='Автор', last_name=str(number), password='pass'
+            )
+            for number in range(3)
+        ]
+        cls.reader = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Тестовый', password='pass'
+        )
+        cls.tags = [
+            Tag.objects.create(name=name, hex_code=hex_code, slug=slug)
+            for name, hex_code, slug in (
+                ('Завтрак', '#E26C2D', 'test-breakfast'),
+                ('Обед', '#49B64E', 'test-lunch'),
+            )
+        ]
+        cls.ingredients = list(Ingredient.objects.order_by('id')[:4])
+        for author in cls.authors:
+            Subscription.objects.create(subscriber=cls.reader, author=author)
+            for number in range(4):
+                cls.create_recipe(author, f'Рецепт {author.id}-{number}')
+
+    @classmethod
+    def create_recipe(cls, author, name):
+        recipe = Recipe.objects.create(
+            author=author, name=name, image='recipes/test.png',
+            description='Описание', cooking_time=10
+        )
+        recipe.tags.set(cls.tags)
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredient=ingredient, amount=2)
+            for ingredient in cls.ingredients
+        )
+        Recipe.objects.filter(pk=recipe.pk).update_relation_ids()
+        Favorite.objects.add_recipe(cls.reader.id, recipe.id)
+        ShoppingCart.objects.add_recipe(cls.reader.id, recipe.id)
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_constant_queries(self, num, url, sizes=(1, 5)):
+        for size in sizes:
+            cache.clear()
+            with self.assertNumQueries(num):
+                response = self.client.get(url, {'limit': size})
+            self.assertEqual(response.status_code, 200)
+
+    def test_recipe_list_anonymous(self):
+        self.assert_constant_queries(4, '/api/recipes/')
+
+    def test_recipe_list_authenticated(self):
+        self.client.force_authenticate(self.reader)
+        self.assert_constant_queries(7, '/api/recipes/')
+
+    def test_recipe_detail(self):
+        self.client.force_authenticate(self.reader)
+        recipe = Recipe.objects.first()
+        with self.assertNumQueries(6):
+            response = self.client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+    def test_users_list(self):
+        self.client.force_authenticate(self.reader)
+        self.assert_constant_queries(3, '/api/users/')
+        ids = [
+            user['id'] for page in (1, 2)
+            for user in self.client.get(
+                '/api/users/', {'limit': 2, 'page': page}
+            ).data['results']
+        ]
+        self.assertEqual(
+            ids, [author.id for author in self.authors] + [self.reader.id]
+        )
+
+    def test_users_me(self):
+        self.client.force_authenticate(self.reader)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_subscriptions(self):
+        self.client.force_authenticate(self.reader)
+        self.assert_constant_queries(4, '/api/users/subscriptions/')
+
+    def test_subscriptions_non_positive_recipes_limit(self):
+        self.client.force_authenticate(self.reader)
+        for recipes_limit in (0, -1):
+            response = self.client.get(
+                '/api/users/subscriptions/', {'recipes_limit': recipes_limit}
+            )
+            self.assertEqual(response.status_code, 200)
+            for author in response.data['results']:
+                self.assertEqual(len(author['recipes']), 4, recipes_limit)
+
+    def test_subscriptions_image_urls_are_absolute(self):
+        Recipe.objects.update(image_variants={'small': {
+            extension: f'recipes/variants/test.{extension}'
+            for extension in IMAGE_FORMATS
+        }})
+        self.client.force_authenticate(self.reader)
+        response = self.client.get('/api/users/subscriptions/')
+        recipe = response.data['results'][0]['recipes'][0]
+        for url in recipe['image_variants']['small'].values():
+            self.assertTrue(url.startswith('http://testserver/'), url)
+
+    def test_download_shopping_cart(self):
+        self.client.force_authenticate(self.reader)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/'
+            )
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(response.status_code, 200)
+        for ingredient in self.ingredients:
+            self.assertIn(ingredient.name, content)
+
+    def test_download_shopping_cart_pdf(self):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'pdf'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertIn(b'DejaVuSans', content)
+
+
+class CatalogCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified_without_queries(self):
+        for url in ('/api/tags/', '/api/ingredients/?name=сол'):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+
+    def test_autocomplete_without_queries(self):
+        self.client.get('/api/ingredients/?name=сол')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/?name=мук')
+        self.assertEqual(response.status_code, 200)
+
+    def test_catalog_change_updates_etag(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(
+                name='Полдник', hex_code='#AABBCC', slug='test-snack'
+            )
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(
+            'test-snack', [tag['slug'] for tag in response.data]
+        )
+
+
+class UserRecipeIdsCacheTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cache@example.com', username='cache',
+            first_name='Кеш', last_name='Тестовый', password='pass'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', image='recipes/test.png',
+            description='Описание', cooking_time=10
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def test_stale_write_after_commit_is_not_served(self):
+        stale_key = get_user_recipes_key(self.user.id, 'favorite_ids')
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.user, recipe=self.recipe)
+        cache.set(stale_key, frozenset())
+        self.assertEqual(
+            get_user_recipe_ids(self.request, 'favorite_ids'),
+            {self.recipe.id}
+        )
+
+
+class FeedTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.first, cls.second = (
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name,
+                first_name=name, last_name=name, password='pass'
+            )
+            for name in ('feed-author', 'feed-first', 'feed-second')
+        )
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1, BACKGROUND_JOBS_EAGER=True)
+    def test_pull_recipes_survive_switch_to_push(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for subscriber in (self.first, self.second):
+                Subscription.objects.create(
+                    subscriber=subscriber, author=self.author
+                )
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.author, name='Рецепт', image='recipes/test.png',
+                description='Описание', cooking_time=10
+            )
+        self.assertFalse(TimelineEntry.objects.filter(recipe=recipe).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.filter(subscriber=self.first).delete()
+        self.client.force_authenticate(self.second)
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [recipe.id]
+        )
+
+
+class SimilarRecipesTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='similar-api@example.com', username='similar-api',
+            first_name='Автор', last_name='Тестовый', password='pass'
+        )
+        cls.tag = Tag.objects.create(
+            name='Ужин', hex_code='#8775D2', slug='test-dinner'
+        )
+        cls.ingredients = list(Ingredient.objects.order_by('id')[:2])
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', image='recipes/test.png',
+            description='Описание', cooking_time=10,
+            ingredient_ids=[cls.ingredients[0].id], tag_ids=[cls.tag.id]
+        )
+        cls.recipe.tags.set([cls.tag])
+        IngredientAmount.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredients[0], amount=1
+        )
+
+    def patch_recipe(self, ingredient):
+        self.client.force_authenticate(self.author)
+        return self.client.patch(f'/api/recipes/{self.recipe.id}/', {
+            'name': 'Новое название',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [self.tag.id],
+            'ingredients': [{'id': ingredient.id, 'amount': 1}],
+        }, format='json')
+
+    def get_similarity_jobs(self):
+        return BackgroundJob.objects.filter(
+            kind='update_similar_recipes',
+            payload__recipe_id=self.recipe.id
+        )
+
+    def test_non_numeric_pk_is_not_found(self):
+        for action in ('similar', 'shopping_cart'):
+            self.client.force_authenticate(self.author)
+            response = self.client.get(f'/api/recipes/abc/{action}/')
+            self.assertEqual(response.status_code, 404, action)
+
+    def test_title_only_update_does_not_queue_similarity(self):
+        response = self.patch_recipe(self.ingredients[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.get_similarity_jobs().exists())
+
+    def test_ingredient_change_queues_similarity(self):
+        response = self.patch_recipe(self.ingredients[1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_similarity_jobs().count(), 1)
+
+
+class UserRecipesFilterTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='filter@example.com', username='filter',
+            first_name='Фильтр', last_name='Тестовый', password='pass'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}',
+                image='recipes/test.png', description='Описание',
+                cooking_time=10
+            )
+            for number in range(3)
+        ]
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    def get_ids(self, params):
+        response = self.client.get('/api/recipes/', dict(params, limit=10))
+        self.assertEqual(response.status_code, 200)
+        return {item['id'] for item in response.data['results']}
+
+    def filter_queryset(self, params):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return RecipeFilter(
+            params, queryset=Recipe.objects.all(), request=request
+        ).qs
+
+    def test_authenticated(self):
+        self.client.force_authenticate(self.user)
+        all_ids = {recipe.id for recipe in self.recipes}
+        for name, recipe in (('is_favorited', self.recipes[0]),
+                             ('is_in_shopping_cart', self.recipes[1])):
+            self.assertEqual(self.get_ids({name: 1}), {recipe.id})
+            self.assertEqual(self.get_ids({name: 0}), all_ids - {recipe.id})
+
+    def test_anonymous(self):
+        all_ids = {recipe.id for recipe in self.recipes}
+        for name in ('is_favorited', 'is_in_shopping_cart'):
+            self.assertEqual(self.get_ids({name: 1}), set())
+            self.assertEqual(self.get_ids({name: 0}), all_ids)
+
+    def get_unique_index(self, model):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        return next(
+            name for name, constraint in constraints.items()
+            if constraint['unique']
+            and constraint['columns'] == ['user_id', 'recipe_id']
+        )
+
+    def test_semi_and_anti_join(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for name, model in (('is_favorited', Favorite),
+                            ('is_in_shopping_cart', ShoppingCart)):
+            index = self.get_unique_index(model)
+            for value, predicate in (('1', 'WHERE EXISTS'),
+                                     ('0', 'WHERE NOT EXISTS')):
+                queryset = self.filter_queryset({name: value})
+                sql = str(queryset.query)
+                self.assertIn(predicate, sql)
+                self.assertNotIn('JOIN', sql)
+                self.assertNotIn('DISTINCT', sql)
+                plan = queryset.explain(analyze=True)
+                self.assertNotIn('SubPlan', plan)
+                self.assertIn(index, plan)
+                if value == '0':
+                    self.assertIn('Anti Join', plan)
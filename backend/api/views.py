@@ -1,32 +1,55 @@
-from django.db.models import F, Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import F, OuterRef, Prefetch, Subquery
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                            ShoppingCart, Subscription, Tag)
+from recipes.models import (Ingredient, Recipe, ShoppingListItem,
+                            Subscription, Tag, TimelineEntry)
+from recipes.transfer import (RecipeImporter, decode_image, encode_image,
+                              export_recipes)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticatedOrReadOnly
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated,
+                                        IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from users.models import User
 
-from .filters import IngredientFilter, RecipeFilter
-from .mixins import CreateDestroyViewSet
+from .filters import RecipeFilter, parse_ids
+from .ingredient_index import ingredient_index
+from .mixins import CatalogCacheMixin, UserRecipesMixin
+from .pagination import (FeedPagination, LimitPageNumberPagination,
+                         RecipePagination)
+from .parsers import NDJSONParser
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (CustomUserSerializer, FavoriteRecipeSerializer,
-                          IngredientSerializer, ReadRecipeSerializer,
-                          ShoppingCartSerializer, ShowFollowerSerializer,
+from .renderers import (CSVShoppingCartRenderer, JSONShoppingCartRenderer,
+                        NDJSONRenderer, PDFShoppingCartRenderer,
+                        TextShoppingCartRenderer)
+from .serializers import (CustomUserSerializer, IngredientSerializer,
+                          PantryRecipeSerializer, ReadRecipeSerializer,
+                          ShowFollowerSerializer, SpecialRecipeSerializer,
                           SubscriptionSerializer, TagSerializer,
                           WriteRecipeSerializer)
 
+RECIPES_LIMIT_DEFAULT = 6
+RECIPES_LIMIT_MAX = 50
+
+
+def get_recipes_limit(request):
+    try:
+        recipes_limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return RECIPES_LIMIT_DEFAULT
+    if recipes_limit <= 0:
+        return RECIPES_LIMIT_DEFAULT
+    return min(recipes_limit, RECIPES_LIMIT_MAX)
+
 
 class CustomUserViewSet(UserViewSet):
-    queryset = User.objects.all()
-    pagination_class = PageNumberPagination
-    page_size_default = 6
-    pagination_class.page_size = page_size_default
+    queryset = User.objects.order_by('id')
+    pagination_class = LimitPageNumberPagination
     permission_classes = (IsAuthenticatedOrReadOnly,)
     serializer_class = CustomUserSerializer
 
@@ -87,8 +110,8 @@ class CustomUserViewSet(UserViewSet):
             serializer = ShowFollowerSerializer(
                 author,
                 context={
-                    'current_user': subscriber,
-                    'recipes_limit': request.query_params.get('recipes_limit')
+                    'request': request,
+                    'recipes_limit': get_recipes_limit(request)
                 }
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -104,32 +127,33 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         subscriber = request.user
-        author = Subscription.objects.filter(subscriber=subscriber)
-        user_obj = []
-        for follow_obj in author:
-            user_obj.append(follow_obj.author)
-        paginator = PageNumberPagination()
-        page_size_default = 6
-        try:
-            page_size = int(request.query_params.get('limit'))
-        except TypeError:
-            page_size = page_size_default
-        except ValueError:
-            page_size = page_size_default
-        paginator.page_size = page_size
-        result_page = paginator.paginate_queryset(user_obj, request)
+        recipes_limit = get_recipes_limit(request)
+        authors = (
+            User.objects.filter(author__subscriber=subscriber)
+            .prefetch_related(Prefetch(
+                'recipe_author',
+                queryset=Recipe.objects.filter(pk__in=Subquery(
+                    Recipe.objects.filter(author_id=OuterRef('author_id'))
+                    .values('pk')[:recipes_limit]
+                )),
+                to_attr='limited_recipes'
+            ))
+            .order_by('author__id')
+        )
+        paginator = LimitPageNumberPagination()
+        result_page = paginator.paginate_queryset(authors, request)
         serializer = ShowFollowerSerializer(
             result_page,
             many=True,
             context={
-                'current_user': subscriber,
-                'recipes_limit': request.query_params.get('recipes_limit')
+                'request': request,
+                'recipes_limit': recipes_limit
             }
         )
         return paginator.get_paginated_response(serializer.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
 
     http_method_names = ['get']
     queryset = Tag.objects.all()
@@ -137,22 +161,30 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
 
     http_method_names = ['get']
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
+    search_param = 'name'
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request, self.search)
+
+    def search(self, request):
+        ingredients = ingredient_index.search(
+            request.query_params.get(self.search_param, '')
+        )
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(UserRecipesMixin, viewsets.ModelViewSet):
 
     http_method_names = ['get', 'post', 'patch', 'delete']
-    pagination_class = PageNumberPagination
-    page_size_default = 6
-    pagination_class.page_size = page_size_default
+    lookup_value_regex = r'\d+'
+    pagination_class = RecipePagination
     queryset = Recipe.objects.all()
     serializer_class = WriteRecipeSerializer
     filter_backends = (DjangoFilterBackend,)
@@ -160,7 +192,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
 
     def get_queryset(self):
-        return Recipe.objects.add_user_annotations(self.request.user.id)
+        return Recipe.objects.add_read_relations()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -170,78 +202,145 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return ReadRecipeSerializer
         return WriteRecipeSerializer
 
-    @action(methods=['delete', 'post'], detail=True)
-    def shopping_cart(self, request, pk=None):
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
         user = request.user
-        recipe = get_object_or_404(Recipe, id=pk)
-        shopping_cart = ShoppingCart.objects.filter(user=user, recipe=recipe)
-        data = {
-            'recipe': pk,
-            'user': user.pk
-        }
-        if request.method == 'POST':
-            serializer = ShoppingCartSerializer(data=data, context=request)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if request.method == 'DELETE':
-            serializer = ShoppingCartSerializer(data=data, context=request)
-            serializer.is_valid(raise_exception=True)
-            shopping_cart.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_sources(
+            (
+                (TimelineEntry.objects.filter(user=user), 'recipe_id'),
+                (
+                    Recipe.objects.filter(
+                        author__author__subscriber=user,
+                        author__followers_count__gt=(
+                            settings.FEED_FANOUT_MAX_FOLLOWERS
+                        )
+                    ),
+                    'id'
+                ),
+            ),
+            request
+        )
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = ReadRecipeSerializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
 
     @action(methods=['get'], detail=False)
+    def pantry(self, request):
+        queryset = self.get_queryset().match_pantry(
+            parse_ids(request.query_params.get('ingredients', ''),
+                      'ingredients')
+        )
+        max_missing = request.query_params.get('max_missing')
+        if max_missing is not None:
+            try:
+                max_missing = int(max_missing)
+            except ValueError:
+                raise ValidationError(
+                    {'max_missing': 'Ожидается целое число.'}
+                )
+            queryset = queryset.filter(missing_count__lte=max_missing)
+        page = self.paginate_queryset(queryset.order_by(
+            'missing_count', '-matched_count', '-pub_date', '-id'
+        ))
+        serializer = PantryRecipeSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=True)
+    def similar(self, request, pk=None):
+        recipes = Recipe.objects.filter(similar_to__recipe_id=pk).order_by(
+            'similar_to__rank'
+        )
+        serializer = SpecialRecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        if not serializer.data:
+            get_object_or_404(Recipe.objects.values('id'), id=pk)
+        return Response(serializer.data)
+
+    @action(methods=['delete', 'post'], detail=True)
+    def shopping_cart(self, request, pk=None):
+        return self.change_user_recipes(request, 'shopping_cart_ids', pk)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            TextShoppingCartRenderer,
+            CSVShoppingCartRenderer,
+            JSONShoppingCartRenderer,
+            PDFShoppingCartRenderer,
+        )
+    )
     def download_shopping_cart(self, request):
-        recipes = (ShoppingCart.objects.filter(user=request.user)
-                   .values('recipe_id'))
-        ingredients = IngredientAmount.objects.filter(recipe__in=recipes)
         agr_shopping_cart = (
-            ingredients.values(
-                'ingredient__name', 'ingredient__measurement_unit'
-            ).annotate(name=F('ingredient__name'),
-                       unit=F('ingredient__measurement_unit'),
-                       total=Sum('amount')).order_by('-total'))
-        text = '\n'.join([
-            f'{ingredient["name"]}: {ingredient["total"]} {ingredient["unit"]}'
-            for ingredient in agr_shopping_cart
-        ])
-        filename = 'my_shopping_cart.txt'
-        response = HttpResponse(text, content_type='text/plain')
+            ShoppingListItem.objects.filter(user=request.user)
+            .values('total', name=F('ingredient__name'),
+                    unit=F('ingredient__measurement_unit'))
+            .order_by('-total'))
+        renderer = request.accepted_renderer
+        filename = f'my_shopping_cart.{renderer.format}'
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(agr_shopping_cart.iterator()),
+            content_type=content_type
+        )
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
 
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='export',
+        permission_classes=(IsAdminUser,),
+        renderer_classes=(NDJSONRenderer,)
+    )
+    def export_ndjson(self, request):
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(export_recipes(encode_image)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = 'attachment; filename=recipes.ndjson'
+        return response
 
-class FavoriteRecipeViewSet(CreateDestroyViewSet):
+    @action(
+        methods=['post'],
+        detail=False,
+        url_path='import',
+        permission_classes=(IsAdminUser,),
+        parser_classes=(NDJSONParser,)
+    )
+    def import_ndjson(self, request):
+        try:
+            imported, skipped = RecipeImporter(decode_image).run(request.data)
+        except (KeyError, TypeError, ValueError) as error:
+            raise ParseError(f'Некорректная запись рецепта: {error}')
+        return Response(
+            {'imported': imported, 'skipped': skipped},
+            status=status.HTTP_201_CREATED
+        )
 
-    serializer_class = FavoriteRecipeSerializer
-    http_method_names = ['post', 'delete']
 
-    def get_queryset(self):
-        user = self.request.user.id
-        return Favorite.objects.filter(user=user)
+class FavoriteRecipeViewSet(UserRecipesMixin, viewsets.ViewSet):
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        context['recipe_id'] = self.kwargs.get('recipe_id')
-        return context
+    http_method_names = ['post', 'delete']
 
-    def perform_create(self, serializer):
-        serializer.save(
-            user=self.request.user,
-            recipe=get_object_or_404(
-                Recipe,
-                id=self.kwargs.get('recipe_id')
-            )
-        )
+    def create(self, request, recipe_id):
+        return self.change_user_recipes(request, 'favorite_ids', recipe_id)
 
-    @action(methods=('delete',), detail=True)
     def delete(self, request, recipe_id):
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        favorite = Favorite.objects.filter(user=request.user, recipe=recipe)
-        if favorite.exists():
-            favorite.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(
-            {'errors': 'Рецепт не был добавлен ранее в избранное'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        return self.change_user_recipes(request, 'favorite_ids', recipe_id)
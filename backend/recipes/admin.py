@@ -1,6 +1,19 @@
 from django.contrib import admin
 
-from .models import Ingredient, IngredientAmount, Recipe, Tag, TagRecipe
+from .jobs import enqueue_jobs
+from .models import (BackgroundJob, Ingredient, IngredientAmount, Recipe,
+                     Tag, TagRecipe)
+
+
+def refresh_relation_ids(recipe_ids):
+    recipes = Recipe.objects.filter(pk__in=recipe_ids)
+    old_ids = dict(recipes.values_list('pk', 'ingredient_ids'))
+    recipes.update_relation_ids()
+    enqueue_jobs('update_similar_recipes', [
+        {'recipe_id': pk}
+        for pk, ingredient_ids in recipes.values_list('pk', 'ingredient_ids')
+        if ingredient_ids != old_ids[pk]
+    ])
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -29,9 +42,37 @@ class RecipeAdmin(admin.ModelAdmin):
         TagsInLine
     ]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_relation_ids([form.instance.pk])
+
+
+class RecipeRelationAdmin(admin.ModelAdmin):
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_relation_ids([obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_relation_ids([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_relation_ids(recipe_ids)
+
+
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'kind', 'status', 'attempts', 'created_at', 'run_after'
+    )
+    list_filter = ('kind', 'status')
+
 
 admin.site.register(Ingredient, IngredientAdmin)
-admin.site.register(IngredientAmount)
+admin.site.register(IngredientAmount, RecipeRelationAdmin)
 admin.site.register(Tag, TagAdmin)
-admin.site.register(TagRecipe)
+admin.site.register(TagRecipe, RecipeRelationAdmin)
 admin.site.register(Recipe, RecipeAdmin)
+admin.site.register(BackgroundJob, BackgroundJobAdmin)
@@ -0,0 +1,111 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import CatalogVersion
+
+INGREDIENTS_FILE = settings.BASE_DIR / 'data' / 'ingredients.json'
+CATALOG_BATCH_SIZE = 5000
+CATALOG_VERSION_ID = 1
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_VERSION_TIMEOUT = 60
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_catalog_version():
+    return (
+        CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID)
+        .values_list('version', flat=True).first()
+    ) or 0
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = read_catalog_version()
+        cache.add(CATALOG_VERSION_KEY, version, CATALOG_VERSION_TIMEOUT)
+    return version
+
+
+def refresh_catalog_version():
+    cache.set(
+        CATALOG_VERSION_KEY, read_catalog_version(), CATALOG_VERSION_TIMEOUT
+    )
+
+
+def bump_catalog_version():
+    now = time.time_ns() // 1000
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(
+        version=Greatest(F('version') + 1, now)
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(
+            pk=CATALOG_VERSION_ID, defaults={'version': now}
+        )
+    transaction.on_commit(refresh_catalog_version)
+
+
+def iter_json_array(file):
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def read_ingredients(path):
+    with open(path, encoding='utf-8', newline='') as file:
+        if str(path).endswith('.csv'):
+            rows = (row for row in csv.reader(file) if row)
+        else:
+            rows = (
+                (item['name'], item['measurement_unit'])
+                for item in iter_json_array(file)
+            )
+        for name, measurement_unit in rows:
+            yield name.strip(), measurement_unit.strip()
+
+
+def iter_batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def load_ingredients(model, rows, batch_size=CATALOG_BATCH_SIZE):
+    seen = set()
+    total = 0
+    before = model.objects.count()
+    for batch in iter_batches(rows, batch_size):
+        objs = []
+        for key in batch:
+            total += 1
+            if key not in seen:
+                seen.add(key)
+                objs.append(model(name=key[0], measurement_unit=key[1]))
+        model.objects.bulk_create(objs, ignore_conflicts=True)
+    return total, model.objects.count() - before
@@ -0,0 +1,90 @@
+import base64
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+IMAGE_FORMATS = {
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+UPLOAD_FORMATS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+}
+PLACEHOLDER_SIZE = (16, 16)
+VARIANTS_DIR = 'recipes/variants'
+
+
+def inspect_image(content):
+    if len(content) > settings.RECIPE_IMAGE_MAX_SIZE:
+        raise ValueError(
+            'Размер изображения не должен превышать '
+            f'{settings.RECIPE_IMAGE_MAX_SIZE} байт.'
+        )
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise ValueError('Слишком большое разрешение изображения.')
+    except OSError:
+        raise ValueError('Файл не является изображением.')
+    if image_format not in UPLOAD_FORMATS:
+        raise ValueError('Допустимые форматы изображения: JPEG, PNG, GIF.')
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise ValueError('Слишком большое разрешение изображения.')
+    return UPLOAD_FORMATS[image_format]
+
+
+def flatten(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, image).convert('RGB')
+    return image.convert('RGB')
+
+
+def save_image(image, path, image_format, options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def build_placeholder(image):
+    placeholder = image.copy()
+    placeholder.thumbnail(PLACEHOLDER_SIZE)
+    buffer = io.BytesIO()
+    placeholder.save(buffer, 'JPEG', quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def build_image_variants(image_file):
+    stem = os.path.splitext(os.path.basename(image_file.name))[0]
+    with image_file.open('rb') as file, Image.open(file) as source:
+        image = flatten(ImageOps.exif_transpose(source))
+    variants = {}
+    for name, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        variants[name] = {
+            'width': resized.width,
+            'height': resized.height,
+        }
+        for extension, (image_format, options) in IMAGE_FORMATS.items():
+            variants[name][extension] = save_image(
+                resized,
+                f'{VARIANTS_DIR}/{stem}_{name}.{extension}',
+                image_format,
+                options
+            )
+    return variants, build_placeholder(image)
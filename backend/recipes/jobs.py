@@ -0,0 +1,161 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import iter_batches
+from .models import BackgroundJob, Recipe, Subscription, TimelineEntry
+from .similarity import update_recipe_similarities
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+MAX_JOB_ATTEMPTS = 3
+JOB_RETRY_DELAY = timedelta(seconds=30)
+FINISHED_JOBS_RETENTION = timedelta(days=7)
+PRUNE_BATCH_SIZE = 10000
+FAN_OUT_BATCH_SIZE = 1000
+
+
+def job_handler(kind):
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+def enqueue_job(kind, **payload):
+    job = BackgroundJob.objects.create(kind=kind, payload=payload)
+    if settings.BACKGROUND_JOBS_EAGER:
+        transaction.on_commit(run_next_job)
+    return job
+
+
+def enqueue_jobs(kind, payloads):
+    jobs = BackgroundJob.objects.bulk_create(
+        [BackgroundJob(kind=kind, payload=payload) for payload in payloads]
+    )
+    if jobs and settings.BACKGROUND_JOBS_EAGER:
+        transaction.on_commit(run_pending_jobs)
+    return jobs
+
+
+def run_pending_jobs():
+    while run_next_job() is not None:
+        pass
+
+
+def run_next_job():
+    with transaction.atomic():
+        job = (
+            BackgroundJob.objects.select_for_update(skip_locked=True)
+            .filter(status=BackgroundJob.PENDING,
+                    run_after__lte=timezone.now())
+            .first()
+        )
+        if job is None:
+            return None
+        try:
+            with transaction.atomic():
+                JOB_HANDLERS[job.kind](**job.payload)
+        except Exception as error:
+            logger.exception('Фоновая задача %s завершилась ошибкой', job)
+            job.attempts += 1
+            job.last_error = repr(error)
+            if job.attempts >= MAX_JOB_ATTEMPTS:
+                job.status = BackgroundJob.FAILED
+            else:
+                job.run_after = timezone.now() + (
+                    JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+                )
+        else:
+            job.status = BackgroundJob.DONE
+            job.finished_at = timezone.now()
+        job.save()
+    return job
+
+
+def prune_finished_jobs(retention=FINISHED_JOBS_RETENTION):
+    finished = BackgroundJob.objects.filter(
+        status=BackgroundJob.DONE,
+        finished_at__lt=timezone.now() - retention
+    )
+    deleted = 0
+    while True:
+        count, _ = BackgroundJob.objects.filter(pk__in=list(
+            finished.values_list('pk', flat=True)[:PRUNE_BATCH_SIZE]
+        )).delete()
+        deleted += count
+        if count < PRUNE_BATCH_SIZE:
+            return deleted
+
+
+def schedule_image_processing(recipe):
+    processed = (
+        Recipe.objects.filter(image_hash=recipe.image_hash)
+        .exclude(pk=recipe.pk).exclude(image_variants={})
+        .values('image_variants', 'image_placeholder').first()
+    )
+    if processed is None:
+        recipe.image_variants = {}
+        recipe.image_placeholder = ''
+        enqueue_job('process_recipe_image', recipe_id=recipe.pk)
+    else:
+        recipe.image_variants = processed['image_variants']
+        recipe.image_placeholder = processed['image_placeholder']
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image_variants=recipe.image_variants,
+        image_placeholder=recipe.image_placeholder
+    )
+
+
+@job_handler('process_recipe_image')
+def process_recipe_image(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only('id', 'image').first()
+    if recipe is not None:
+        recipe.process_image()
+
+
+def needs_fan_out(followers_count):
+    return 0 < followers_count <= settings.FEED_FANOUT_MAX_FOLLOWERS
+
+
+@job_handler('fan_out_recipe')
+def fan_out_recipe(recipe_id):
+    recipe = (
+        Recipe.objects.filter(pk=recipe_id)
+        .values('author_id', 'pub_date').first()
+    )
+    if recipe is None:
+        return
+    subscribers = (
+        Subscription.objects.filter(author_id=recipe['author_id'])
+        .order_by().values_list('subscriber_id', flat=True)
+    )
+    for user_ids in iter_batches(
+        subscribers.iterator(chunk_size=FAN_OUT_BATCH_SIZE),
+        FAN_OUT_BATCH_SIZE
+    ):
+        TimelineEntry.objects.add_recipe(
+            recipe_id, recipe['pub_date'], user_ids
+        )
+
+
+@job_handler('backfill_author_timelines')
+def backfill_author_timelines(author_id):
+    subscribers = (
+        Subscription.objects.filter(author_id=author_id)
+        .order_by().values_list('subscriber_id', flat=True)
+    )
+    for user_ids in iter_batches(
+        subscribers.iterator(chunk_size=FAN_OUT_BATCH_SIZE),
+        FAN_OUT_BATCH_SIZE
+    ):
+        TimelineEntry.objects.add_author(user_ids, author_id)
+
+
+@job_handler('update_similar_recipes')
+def update_similar_recipes(recipe_id):
+    update_recipe_similarities(recipe_id)
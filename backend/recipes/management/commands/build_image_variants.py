@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии и заглушки изображений рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересобрать варианты и для уже обработанных рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.only('id', 'image')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        processed = 0
+        failed = 0
+        for recipe in recipes.iterator():
+            try:
+                recipe.process_image()
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.id}: {error}')
+                continue
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {processed}, с ошибками: {failed}'
+        ))
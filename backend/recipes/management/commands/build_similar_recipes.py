@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from recipes.similarity import (SIMILAR_RECIPES_LIMIT, SIMILARITY_BATCH_SIZE,
+                                SIMILARITY_MAX_SHARE, rebuild_similarities)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает похожие рецепты по коэффициенту Жаккара '
+            'для множеств ингредиентов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=SIMILAR_RECIPES_LIMIT,
+            help='Сколько похожих рецептов хранить для каждого рецепта.'
+        )
+        parser.add_argument(
+            '--max-share',
+            type=float,
+            default=SIMILARITY_MAX_SHARE,
+            help=('Не учитывать ингредиенты, которые встречаются в большей '
+                  'доле рецептов (соль, вода).')
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SIMILARITY_BATCH_SIZE,
+            help='Сколько рецептов обрабатывать одной транзакцией.'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_similarities(
+            options['limit'], options['max_share'], options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты пересчитаны для {total} рецептов'
+        ))
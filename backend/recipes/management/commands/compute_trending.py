@@ -0,0 +1,101 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import FloatField, Sum, Value
+from django.db.models.functions import Exp, Extract
+from django.utils import timezone
+from recipes.catalog import iter_batches
+from recipes.models import Favorite, ShoppingCart, TagRecipe, TrendingRecipe
+
+TRENDING_SOURCES = (
+    (Favorite, 1.0),
+    (ShoppingCart, 0.5),
+)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинг популярных рецептов с затуханием '
+            'по времени, общий и по тегам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--half-life',
+            type=float,
+            default=72,
+            help='Период полураспада веса добавления, в часах.'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Учитывать добавления за последние N дней.'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=1000,
+            help='Сколько рецептов хранить в каждом рейтинге.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Размер пакета при чтении тегов и вставке строк.'
+        )
+
+    def get_scores(self, half_life, days):
+        now = timezone.now()
+        decay = math.log(2) / (half_life * 3600)
+        scores = defaultdict(float)
+        for model, weight in TRENDING_SOURCES:
+            rows = (
+                model.objects.filter(adding_dt__gte=now - timedelta(days=days))
+                .order_by().values('recipe_id')
+                .annotate(score=Sum(
+                    Exp(
+                        (Extract('adding_dt', 'epoch')
+                         - Value(now.timestamp())) * Value(decay)
+                    ),
+                    output_field=FloatField()
+                ))
+                .values_list('recipe_id', 'score')
+            )
+            for recipe_id, score in rows.iterator():
+                scores[recipe_id] += weight * score
+        return scores
+
+    def get_tag_scores(self, scores, batch_size):
+        tag_scores = defaultdict(dict)
+        for recipe_ids in iter_batches(scores, batch_size):
+            for tag_id, recipe_id in (
+                TagRecipe.objects.filter(recipe_id__in=recipe_ids)
+                .values_list('tag_id', 'recipe_id')
+            ):
+                tag_scores[tag_id][recipe_id] = scores[recipe_id]
+        return tag_scores
+
+    def rank(self, tag_id, scores, limit):
+        top = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        for rank, (recipe_id, score) in enumerate(top[:limit], start=1):
+            yield TrendingRecipe(
+                recipe_id=recipe_id, tag_id=tag_id, score=score, rank=rank
+            )
+
+    def handle(self, *args, **options):
+        scores = self.get_scores(options['half_life'], options['days'])
+        tag_scores = self.get_tag_scores(scores, options['batch_size'])
+        rows = [*self.rank(None, scores, options['limit'])]
+        for tag_id, recipes in tag_scores.items():
+            rows.extend(self.rank(tag_id, recipes, options['limit']))
+        with transaction.atomic():
+            TrendingRecipe.objects.all().delete()
+            TrendingRecipe.objects.bulk_create(
+                rows, batch_size=options['batch_size']
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов в рейтинге: {min(len(scores), options["limit"])}, '
+            f'тегов: {len(tag_scores)}'
+        ))
@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from recipes.transfer import (TRANSFER_BATCH_SIZE, ImageDirectory,
+                              export_recipes)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает рецепты в NDJSON, изображения сохраняются '
+            'в отдельную директорию рядом с файлом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл для выгрузки (.ndjson).')
+        parser.add_argument(
+            '--images-dir',
+            help='Директория для изображений, по умолчанию <path>.images.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=TRANSFER_BATCH_SIZE,
+            help='Количество рецептов, читаемых из базы за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        images = ImageDirectory(
+            options['images_dir'] or path.with_name(path.name + '.images')
+        )
+        exported = 0
+        with open(path, 'w', encoding='utf-8') as file:
+            for record in export_recipes(images.dump, options['chunk_size']):
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                exported += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {exported}'
+        ))
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.transfer import (TRANSFER_BATCH_SIZE, ImageDirectory,
+                              RecipeImporter)
+
+
+class Command(BaseCommand):
+    help = 'Загружает рецепты из NDJSON, выгруженного export_recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с рецептами (.ndjson).')
+        parser.add_argument(
+            '--images-dir',
+            help='Директория с изображениями, по умолчанию <path>.images.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TRANSFER_BATCH_SIZE,
+            help='Количество рецептов, сохраняемых одним пакетом запросов.'
+        )
+
+    def read_records(self, file):
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise CommandError(f'Строка {number}: {error}')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        images = ImageDirectory(
+            options['images_dir'] or path.with_name(path.name + '.images')
+        )
+        importer = RecipeImporter(images.load, options['batch_size'])
+        try:
+            with open(path, encoding='utf-8') as file:
+                imported, skipped = importer.run(self.read_records(file))
+        except (OSError, KeyError, TypeError, ValueError) as error:
+            raise CommandError(
+                f'Не удалось загрузить рецепты, ничего не сохранено: {error}'
+            )
+        self.stdout.write(
+            f'Загружено рецептов: {imported}, '
+            f'пропущено без автора: {skipped}'
+        )
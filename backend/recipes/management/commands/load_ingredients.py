@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.catalog import (CATALOG_BATCH_SIZE, INGREDIENTS_FILE,
+                             bump_catalog_version, load_ingredients,
+                             read_ingredients)
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = ('Загружает справочник ингредиентов из CSV или JSON, '
+            'пропуская уже существующие записи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=INGREDIENTS_FILE,
+            help='Файл .csv (name,measurement_unit) или .json.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=CATALOG_BATCH_SIZE,
+            help='Размер пакета при вставке строк.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                total, inserted = load_ingredients(
+                    Ingredient,
+                    read_ingredients(options['path']),
+                    options['batch_size']
+                )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Не удалось загрузить ингредиенты: {error}')
+        if inserted:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк в файле: {total}, добавлено: {inserted}, '
+            f'уже было: {total - inserted}'
+        ))
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Sum
+from recipes.models import (SHOPPING_LIST_EMPTY_TOTAL, ShoppingCart,
+                            ShoppingListItem)
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает агрегированные списки покупок пользователей '
+            'или сверяет их с корзинами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить агрегаты с корзинами, ничего не меняя.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пакета при вставке строк.'
+        )
+
+    def get_expected_items(self):
+        return (
+            ShoppingCart.objects
+            .filter(recipe__ingredientrec__isnull=False)
+            .values('user_id')
+            .annotate(ingredient_id=F('recipe__ingredientrec__ingredient'),
+                      total=Sum('recipe__ingredientrec__amount'))
+            .values_list('user_id', 'ingredient_id', 'total')
+            .order_by()
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            self.verify()
+        else:
+            self.rebuild(options['batch_size'])
+
+    @transaction.atomic
+    def rebuild(self, batch_size):
+        ShoppingListItem.objects.all().delete()
+        batch = []
+        created = 0
+        for user_id, ingredient_id, total in (
+            self.get_expected_items().iterator(chunk_size=batch_size)
+        ):
+            batch.append(ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, total=total
+            ))
+            if len(batch) >= batch_size:
+                ShoppingListItem.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        ShoppingListItem.objects.bulk_create(batch)
+        created += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, позиций: {created}'
+        ))
+
+    def verify(self):
+        expected = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in self.get_expected_items().iterator()
+        }
+        mismatches = 0
+        for user_id, ingredient_id, total in (
+            ShoppingListItem.objects
+            .values_list('user_id', 'ingredient_id', 'total').iterator()
+        ):
+            expected_total = expected.pop((user_id, ingredient_id), 0)
+            if abs(expected_total - total) > SHOPPING_LIST_EMPTY_TOTAL:
+                mismatches += 1
+                self.stdout.write(
+                    f'user={user_id} ingredient={ingredient_id}: '
+                    f'{total} вместо {expected_total}'
+                )
+        for (user_id, ingredient_id), total in expected.items():
+            mismatches += 1
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'отсутствует, ожидается {total}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений в списках покупок: {mismatches}')
+        self.stdout.write(self.style.SUCCESS('Списки покупок согласованы'))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe, ShoppingCart, Subscription
+from users.models import User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики рецептов '
+            'и пользователей или сверяет их с исходными таблицами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить счётчики, ничего не меняя.'
+        )
+
+    def get_actual(self, source, field):
+        return Coalesce(
+            Subquery(
+                source.objects.filter(**{field: OuterRef('pk')})
+                .order_by().values(field).annotate(total=Count('pk'))
+                .values('total'),
+                output_field=IntegerField()
+            ),
+            0
+        )
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for model, counter, source, field in COUNTERS:
+            actual = self.get_actual(source, field)
+            stale = model.objects.annotate(actual=actual).exclude(
+                **{counter: F('actual')}
+            )
+            if options['verify']:
+                count = stale.count()
+            else:
+                count = model.objects.filter(
+                    pk__in=stale.values('pk')
+                ).update(**{counter: actual})
+            mismatches += count
+            self.stdout.write(
+                f'{model._meta.model_name}.{counter}: расхождений {count}'
+            )
+        if options['verify'] and mismatches:
+            raise CommandError(f'Расхождений в счётчиках: {mismatches}')
+        self.stdout.write(self.style.SUCCESS('Счётчики согласованы'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.jobs import prune_finished_jobs, run_next_job
+
+PRUNE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в базе данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить накопившиеся задачи и завершиться.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+
+    def handle(self, *args, **options):
+        pruned_at = 0
+        while True:
+            job = run_next_job()
+            if job is not None:
+                self.stdout.write(str(job))
+                continue
+            if time.monotonic() - pruned_at > PRUNE_INTERVAL:
+                deleted = prune_finished_jobs()
+                pruned_at = time.monotonic()
+                if deleted:
+                    self.stdout.write(f'Удалено выполненных задач: {deleted}')
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
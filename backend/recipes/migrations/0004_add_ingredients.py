@@ -7,19 +7,23 @@ with open(os.path.join('data', 'ingredients.json'), 'r') as file:
     ingredients_json = file.read()
 
 INITIAL_INGREDIENTS = json.loads(ingredients_json)
+BATCH_SIZE = 1000
 
 
 def add_ingredients(apps, schema_editor):
     Ingredient = apps.get_model('recipes', 'Ingredient')
-    for ingredient in INITIAL_INGREDIENTS:
-        new_ingredient = Ingredient(**ingredient)
-        new_ingredient.save()
+    Ingredient.objects.bulk_create(
+        [Ingredient(**ingredient) for ingredient in INITIAL_INGREDIENTS],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
 
 
 def remove_ingredients(apps, schema_editor):
     Ingredient = apps.get_model('recipes', 'Ingredient')
-    for ingredient in INITIAL_INGREDIENTS:
-        Ingredient.objects.get(name=ingredient['name']).delete()
+    Ingredient.objects.filter(
+        name__in=[ingredient['name'] for ingredient in INITIAL_INGREDIENTS]
+    ).delete()
 
 
 class Migration(migrations.Migration):
@@ -0,0 +1,93 @@
+# Generated by Django 4.1.6 on 2026-10-18 19:51
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+FILL_SHOPPING_LIST = '''
+INSERT INTO recipes_shoppinglistitem (user_id, ingredient_id, total)
+SELECT cart.user_id, ia.ingredient_id, SUM(ia.amount)
+FROM recipes_shoppingcart cart
+JOIN recipes_ingredientamount ia USING (recipe_id)
+GROUP BY 1, 2;
+'''
+
+CLEAR_SHOPPING_LIST = 'TRUNCATE recipes_shoppinglistitem;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_add_ingredients'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.FloatField(default=0, help_text='Суммарное количество ингредиента по рецептам в корзине', verbose_name='Количество')),
+            ],
+            options={
+                'verbose_name': 'Позиция списка покупок',
+                'verbose_name_plural': 'Позиции списка покупок',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='shoppingcart',
+            options={'ordering': ['-adding_dt'], 'verbose_name': 'Список покупок', 'verbose_name_plural': ('Список покупок',)},
+        ),
+        migrations.RemoveConstraint(
+            model_name='ingredientamount',
+            name='amount is non-negative',
+        ),
+        migrations.AlterUniqueTogether(
+            name='shoppingcart',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='ingredientamount',
+            name='amount',
+            field=models.FloatField(help_text='Количество ингредиента', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Количество'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='author',
+            field=models.ForeignKey(help_text='Автор рецепта', on_delete=django.db.models.deletion.CASCADE, related_name='recipe_author', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='hex_code',
+            field=models.CharField(help_text='Цветовой hex-код', max_length=7, validators=[django.core.validators.RegexValidator('^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$', message='Формат hex-code некорректен')], verbose_name='Цвет'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(help_text='Название тега', max_length=200, validators=[django.core.validators.RegexValidator('[А-Яа-яA-Za-z0-9- ]', message='Введите корректное имя тега')], verbose_name='Тег'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientamount',
+            constraint=models.CheckConstraint(check=models.Q(('amount__gte', 1.0)), name='amount is more then 1'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='user_and_ricipe_are_unique_together'),
+        ),
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='ingredient',
+            field=models.ForeignKey(help_text='Ингредиент в списке покупок', on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='recipes.ingredient', verbose_name='Ингредиент'),
+        ),
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='user',
+            field=models.ForeignKey(help_text='Владелец списка покупок', on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='user_and_ingredient_are_unique_together'),
+        ),
+        migrations.RunSQL(FILL_SHOPPING_LIST, CLEAR_SHOPPING_LIST),
+    ]
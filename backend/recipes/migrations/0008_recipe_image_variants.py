@@ -0,0 +1,23 @@
+# Generated by Django 4.1.6 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_placeholder',
+            field=models.TextField(blank=True, help_text='Крошечное превью изображения в виде data URI', verbose_name='Заглушка изображения'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Уменьшенные копии изображения в форматах JPEG и WebP', verbose_name='Варианты изображения'),
+        ),
+    ]
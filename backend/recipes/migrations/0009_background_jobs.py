@@ -0,0 +1,40 @@
+# Generated by Django 4.1.6 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(help_text='Название обработчика задачи', max_length=100, verbose_name='Тип')),
+                ('payload', models.JSONField(default=dict, help_text='Аргументы обработчика задачи', verbose_name='Параметры')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='pending', help_text='Состояние задачи', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='Количество неудачных запусков', verbose_name='Попытки')),
+                ('last_error', models.TextField(blank=True, help_text='Текст ошибки последнего неудачного запуска', verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 содержимого исходного изображения', max_length=64, verbose_name='Хеш изображения'),
+        ),
+        migrations.AddIndex(
+            model_name='backgroundjob',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='background_job_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.1.6 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+SEARCH_VECTOR_TRIGGER_ON_TEXT = '''
+DROP TRIGGER recipes_recipe_search_vector_trigger ON recipes_recipe;
+CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update();
+'''
+
+SEARCH_VECTOR_TRIGGER_ON_ANY = '''
+DROP TRIGGER recipes_recipe_search_vector_trigger ON recipes_recipe;
+CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update();
+'''
+
+FILL_COUNTERS = '''
+UPDATE recipes_recipe SET
+    favorites_count = (
+        SELECT COUNT(*) FROM recipes_favorite
+        WHERE recipes_favorite.recipe_id = recipes_recipe.id
+    ),
+    in_carts_count = (
+        SELECT COUNT(*) FROM recipes_shoppingcart
+        WHERE recipes_shoppingcart.recipe_id = recipes_recipe.id
+    );
+UPDATE users_user SET
+    recipes_count = (
+        SELECT COUNT(*) FROM recipes_recipe
+        WHERE recipes_recipe.author_id = users_user.id
+    ),
+    followers_count = (
+        SELECT COUNT(*) FROM recipes_subscription
+        WHERE recipes_subscription.author_id = users_user.id
+    );
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_background_jobs'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Сколько пользователей добавили рецепт в избранное', verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Сколько пользователей добавили рецепт в список покупок', verbose_name='В списках покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunSQL(
+            SEARCH_VECTOR_TRIGGER_ON_TEXT, SEARCH_VECTOR_TRIGGER_ON_ANY
+        ),
+        migrations.RunSQL(FILL_COUNTERS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.6 on 2026-10-18 20:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Популярность')),
+                ('rank', models.PositiveIntegerField(verbose_name='Место')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending', to='recipes.recipe', verbose_name='Рецепт')),
+                ('tag', models.ForeignKey(blank=True, db_index=False, help_text='Пусто для общего рейтинга', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trending', to='recipes.tag', verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'Популярный рецепт',
+                'verbose_name_plural': 'Популярные рецепты',
+                'ordering': ('tag', 'rank'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingrecipe',
+            index=models.Index(fields=['tag', 'rank'], include=('recipe',), name='trending_tag_rank_idx'),
+        ),
+    ]
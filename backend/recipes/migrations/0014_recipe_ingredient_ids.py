@@ -0,0 +1,33 @@
+# Generated by Django 4.1.6 on 2026-10-18 20:09
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+FILL_INGREDIENT_IDS = '''
+UPDATE recipes_recipe SET ingredient_ids = ARRAY(
+    SELECT DISTINCT ingredient_id FROM recipes_ingredientamount
+    WHERE recipes_ingredientamount.recipe_id = recipes_recipe.id
+    ORDER BY ingredient_id
+);
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_similarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, help_text='Отсортированные id ингредиентов рецепта для поиска', size=None, verbose_name='Идентификаторы ингредиентов'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='recipe_ingredient_ids_idx'),
+        ),
+        migrations.RunSQL(FILL_INGREDIENT_IDS, migrations.RunSQL.noop),
+    ]
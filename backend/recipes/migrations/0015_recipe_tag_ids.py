@@ -0,0 +1,33 @@
+# Generated by Django 4.1.6 on 2026-10-18 20:10
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+FILL_TAG_IDS = '''
+UPDATE recipes_recipe SET tag_ids = ARRAY(
+    SELECT DISTINCT tag_id FROM recipes_tagrecipe
+    WHERE recipes_tagrecipe.recipe_id = recipes_recipe.id
+    ORDER BY tag_id
+);
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_ingredient_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, help_text='Отсортированные id тегов рецепта для фильтрации', size=None, verbose_name='Идентификаторы тегов'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='recipe_tag_ids_idx'),
+        ),
+        migrations.RunSQL(FILL_TAG_IDS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.6 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+CREATE_CATALOG_VERSION = '''
+INSERT INTO recipes_catalogversion (id, version)
+VALUES (1, (extract(epoch FROM clock_timestamp()) * 1000000)::bigint);
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_tag_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(help_text='Время последнего изменения тегов или ингредиентов в мкс', verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия справочников',
+                'verbose_name_plural': 'Версия справочников',
+            },
+        ),
+        migrations.RunSQL(CREATE_CATALOG_VERSION, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.6 on 2026-10-18 20:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='run_after',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Время, раньше которого задача не выполняется', verbose_name='Запустить после'),
+        ),
+    ]
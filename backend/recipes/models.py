@@ -1,9 +1,26 @@
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
-from django.db.models import (CheckConstraint, Exists, OuterRef, Q,
-                              UniqueConstraint)
+from django.db import connection, models, transaction
+from django.db.models import (Case, CheckConstraint, Exists, F, FloatField,
+                              Func, IntegerField, OuterRef, Prefetch, Q,
+                              Sum, UniqueConstraint, Value, When)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from users.models import User
 
+from .images import build_image_variants
+
+SHOPPING_LIST_EMPTY_TOTAL = 1e-6
+TIMELINE_BACKFILL_LIMIT = 50
+
+
+def change_counter(field, delta):
+    return {field: Greatest(F(field) + delta, 0)}
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -94,6 +111,20 @@ class Tag(models.Model):
         return self.name
 
 
+class CatalogVersion(models.Model):
+    version = models.BigIntegerField(
+        verbose_name='Версия',
+        help_text='Время последнего изменения тегов или ингредиентов в мкс'
+    )
+
+    class Meta:
+        verbose_name = 'Версия справочников'
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return str(self.version)
+
+
 class TagRecipe(models.Model):
     tag = models.ForeignKey(
         Tag,
@@ -135,6 +166,56 @@ class Subscription(models.Model):
     )
 
 
+class UserRecipeQuerySet(models.QuerySet):
+
+    @transaction.atomic
+    def add_recipe(self, user_id, recipe_id):
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote_name(self.model._meta.db_table)} '
+                '(user_id, recipe_id, adding_dt) '
+                f'SELECT %s, id, %s FROM {quote_name(Recipe._meta.db_table)} '
+                'WHERE id = %s ON CONFLICT DO NOTHING RETURNING id',
+                (user_id, timezone.now(), recipe_id)
+            )
+            added = cursor.fetchone() is not None
+        if added:
+            self.model.change_recipe_counter(recipe_id, 1)
+        return added
+
+    @transaction.atomic
+    def remove_recipe(self, user_id, recipe_id):
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote_name(self.model._meta.db_table)} '
+                'WHERE user_id = %s AND recipe_id = %s RETURNING id',
+                (user_id, recipe_id)
+            )
+            removed = cursor.fetchone() is not None
+        if removed:
+            self.model.change_recipe_counter(recipe_id, -1)
+        return removed
+
+
+class ShoppingCartQuerySet(UserRecipeQuerySet):
+
+    @transaction.atomic
+    def add_recipe(self, user_id, recipe_id):
+        added = super().add_recipe(user_id, recipe_id)
+        if added:
+            ShoppingListItem.objects.add_recipe(user_id, recipe_id)
+        return added
+
+    @transaction.atomic
+    def remove_recipe(self, user_id, recipe_id):
+        removed = super().remove_recipe(user_id, recipe_id)
+        if removed:
+            ShoppingListItem.objects.remove_recipe(user_id, recipe_id)
+        return removed
+
+
 class Favorite(models.Model):
     recipe = models.ForeignKey(
         'Recipe',
@@ -152,6 +233,10 @@ class Favorite(models.Model):
     )
     adding_dt = models.DateTimeField(auto_now_add=True)
 
+    objects = UserRecipeQuerySet.as_manager()
+
+    recipe_counter = 'favorites_count'
+
     class Meta:
         ordering = ['-adding_dt']
         verbose_name = 'Избранное'
@@ -161,6 +246,12 @@ class Favorite(models.Model):
     def __str__(self):
         return f'{self.user} added {self.recipe}'
 
+    @classmethod
+    def change_recipe_counter(cls, recipe_id, delta):
+        Recipe.objects.filter(pk=recipe_id).update(
+            **change_counter(cls.recipe_counter, delta)
+        )
+
 
 class ShoppingCart(models.Model):
     recipe = models.ForeignKey(
@@ -179,6 +270,10 @@ class ShoppingCart(models.Model):
     )
     adding_dt = models.DateTimeField(auto_now_add=True)
 
+    objects = ShoppingCartQuerySet.as_manager()
+
+    recipe_counter = 'in_carts_count'
+
     class Meta:
         ordering = ['-adding_dt']
         verbose_name = 'Список покупок'
@@ -193,6 +288,105 @@ class ShoppingCart(models.Model):
     def __str__(self):
         return f"{self.user} added {self.recipe}"
 
+    @classmethod
+    def change_recipe_counter(cls, recipe_id, delta):
+        Recipe.objects.filter(pk=recipe_id).update(
+            **change_counter(cls.recipe_counter, delta)
+        )
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    @staticmethod
+    def get_recipe_amounts(recipe_id):
+        return dict(
+            IngredientAmount.objects.filter(recipe_id=recipe_id)
+            .values('ingredient_id').annotate(total=Sum('amount'))
+            .values_list('ingredient_id', 'total')
+        )
+
+    def add_recipe(self, user_id, recipe_id):
+        self.apply_deltas([user_id], self.get_recipe_amounts(recipe_id))
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.apply_deltas([user_id], {
+            ingredient_id: -total for ingredient_id, total
+            in self.get_recipe_amounts(recipe_id).items()
+        })
+
+    def change_recipe(self, recipe_id, old_amounts, new_amounts):
+        deltas = {
+            ingredient_id: (new_amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        }
+        user_ids = list(
+            ShoppingCart.objects.filter(recipe_id=recipe_id)
+            .values_list('user_id', flat=True)
+        )
+        self.apply_deltas(user_ids, deltas)
+
+    @transaction.atomic
+    def apply_deltas(self, user_ids, deltas):
+        deltas = {
+            ingredient_id: delta for ingredient_id, delta in deltas.items()
+            if delta
+        }
+        if not user_ids or not deltas:
+            return
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, ingredient_id=ingredient_id)
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items() if delta > 0
+            ],
+            ignore_conflicts=True
+        )
+        items = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        items.update(total=F('total') + Case(
+            *(When(ingredient_id=ingredient_id, then=Value(delta))
+              for ingredient_id, delta in deltas.items()),
+            default=Value(0.0),
+            output_field=FloatField()
+        ))
+        items.filter(total__lt=SHOPPING_LIST_EMPTY_TOTAL).delete()
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+        help_text='Владелец списка покупок'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+        help_text='Ингредиент в списке покупок'
+    )
+    total = models.FloatField(
+        default=0,
+        verbose_name='Количество',
+        help_text='Суммарное количество ингредиента по рецептам в корзине'
+    )
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='user_and_ingredient_are_unique_together'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.total}'
+
 
 class RecipeQuerySet(models.QuerySet):
     def add_user_annotations(self, user_id):
@@ -207,6 +401,43 @@ class RecipeQuerySet(models.QuerySet):
             )
         )
 
+    def update_relation_ids(self):
+        return self.update(
+            ingredient_ids=ArraySubquery(
+                IngredientAmount.objects.filter(recipe_id=OuterRef('pk'))
+                .order_by('ingredient_id').distinct().values('ingredient_id')
+            ),
+            tag_ids=ArraySubquery(
+                TagRecipe.objects.filter(recipe_id=OuterRef('pk'))
+                .order_by('tag_id').distinct().values('tag_id')
+            )
+        )
+
+    def match_pantry(self, ingredient_ids):
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        return self.filter(ingredient_ids__overlap=ingredient_ids).annotate(
+            matched_count=RawSQL(
+                f'SELECT count(*) FROM unnest({table}.ingredient_ids) '
+                'AS ingredient_id WHERE ingredient_id = ANY(%s)',
+                (ingredient_ids,),
+                output_field=IntegerField()
+            ),
+            missing_count=Func(
+                F('ingredient_ids'),
+                function='cardinality',
+                output_field=IntegerField()
+            ) - F('matched_count')
+        )
+
+    def add_read_relations(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientrec',
+                queryset=IngredientAmount.objects.select_related('ingredient')
+            )
+        )
+
 
 class Recipe(models.Model):
     author = models.ForeignKey(
@@ -226,6 +457,24 @@ class Recipe(models.Model):
         verbose_name='Картинка',
         help_text='Изображение рецепта'
     )
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name='Хеш изображения',
+        help_text='SHA-256 содержимого исходного изображения'
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Варианты изображения',
+        help_text='Уменьшенные копии изображения в форматах JPEG и WebP'
+    )
+    image_placeholder = models.TextField(
+        blank=True,
+        verbose_name='Заглушка изображения',
+        help_text='Крошечное превью изображения в виде data URI'
+    )
     description = models.TextField(
         verbose_name='Описание',
         help_text='Описание рецепта'
@@ -250,13 +499,272 @@ class Recipe(models.Model):
         validators=[MinValueValidator(1)]
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    ingredient_ids = ArrayField(
+        models.BigIntegerField(),
+        default=list,
+        editable=False,
+        verbose_name='Идентификаторы ингредиентов',
+        help_text='Отсортированные id ингредиентов рецепта для поиска'
+    )
+    tag_ids = ArrayField(
+        models.BigIntegerField(),
+        default=list,
+        editable=False,
+        verbose_name='Идентификаторы тегов',
+        help_text='Отсортированные id тегов рецепта для фильтрации'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+        help_text='Сколько пользователей добавили рецепт в избранное'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок',
+        help_text='Сколько пользователей добавили рецепт в список покупок'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+        help_text='Заполняется триггером из названия и описания'
+    )
 
     objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date', '-id'),
+                name='recipe_favorites_count_idx'
+            ),
+            GinIndex(fields=('search_vector',), name='recipe_search_idx'),
+            GinIndex(
+                fields=('ingredient_ids',), name='recipe_ingredient_ids_idx'
+            ),
+            GinIndex(fields=('tag_ids',), name='recipe_tag_ids_idx'),
+            GinIndex(
+                fields=('name',),
+                opclasses=('gin_trgm_ops',),
+                name='recipe_name_trgm_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
+
+    def process_image(self):
+        self.image_variants, self.image_placeholder = build_image_variants(
+            self.image
+        )
+        Recipe.objects.filter(pk=self.pk).update(
+            image_variants=self.image_variants,
+            image_placeholder=self.image_placeholder
+        )
+
+
+class BackgroundJob(models.Model):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    kind = models.CharField(
+        max_length=100,
+        verbose_name='Тип',
+        help_text='Название обработчика задачи'
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name='Параметры',
+        help_text='Аргументы обработчика задачи'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус',
+        help_text='Состояние задачи'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки',
+        help_text='Количество неудачных запусков'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+        help_text='Текст ошибки последнего неудачного запуска'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запустить после',
+        help_text='Время, раньше которого задача не выполняется'
+    )
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = (
+            models.Index(
+                fields=('id',),
+                condition=Q(status='pending'),
+                name='background_job_pending_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.kind} #{self.id} ({self.status})'
+
+
+class TrendingRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='trending',
+        verbose_name='Рецепт'
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='trending',
+        verbose_name='Тег',
+        help_text='Пусто для общего рейтинга'
+    )
+    score = models.FloatField(verbose_name='Популярность')
+    rank = models.PositiveIntegerField(verbose_name='Место')
+
+    class Meta:
+        ordering = ('tag', 'rank')
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+        indexes = (
+            models.Index(
+                fields=('tag', 'rank'),
+                include=('recipe',),
+                name='trending_tag_rank_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.rank}. {self.recipe_id} ({self.tag_id})'
+
+
+class TimelineEntryQuerySet(models.QuerySet):
+
+    def add_recipe(self, recipe_id, pub_date, user_ids):
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, recipe_id=recipe_id,
+                           pub_date=pub_date)
+                for user_id in user_ids
+            ],
+            ignore_conflicts=True
+        )
+
+    def add_author(self, user_ids, author_id):
+        recipes = list(
+            Recipe.objects.filter(author_id=author_id)
+            .values_list('id', 'pub_date')[:TIMELINE_BACKFILL_LIMIT]
+        )
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, recipe_id=recipe_id,
+                           pub_date=pub_date)
+                for user_id in user_ids
+                for recipe_id, pub_date in recipes
+            ],
+            ignore_conflicts=True
+        )
+
+    def remove_author(self, user_id, author_id):
+        self.filter(user_id=user_id, recipe__author_id=author_id).delete()
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации рецепта')
+
+    objects = TimelineEntryQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'recipe'), name='timeline_user_recipe_unique'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='timeline_user_pub_date_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user_id}: {self.recipe_id}'
+
+
+class RecipeSimilarity(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='similarities',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+
+    class Meta:
+        ordering = ('recipe', 'rank')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        indexes = (
+            models.Index(
+                fields=('recipe', 'rank'),
+                include=('similar',),
+                name='recipe_similarity_rank_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id} ({self.score:.2f})'
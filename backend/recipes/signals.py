@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.db.models import F, Func, Value
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from users.models import User
+
+from .catalog import bump_catalog_version
+from .jobs import enqueue_job, needs_fan_out
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                     ShoppingListItem, Subscription, Tag, TimelineEntry,
+                     change_counter)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            instance.user_id, instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    ShoppingListItem.objects.remove_recipe(
+        instance.user_id, instance.recipe_id
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        sender.change_recipe_counter(instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    sender.change_recipe_counter(instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            **change_counter('recipes_count', 1)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.author_id).update(
+        **change_counter('recipes_count', -1)
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def increment_followers_count(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            **change_counter('followers_count', 1)
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_followers_count(sender, instance, **kwargs):
+    authors = User.objects.filter(pk=instance.author_id)
+    authors.update(**change_counter('followers_count', -1))
+    followers_count = authors.values_list('followers_count', flat=True).first()
+    if followers_count == settings.FEED_FANOUT_MAX_FOLLOWERS:
+        enqueue_job('backfill_author_timelines', author_id=instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if not created:
+        return
+    followers_count = User.objects.values_list(
+        'followers_count', flat=True
+    ).get(pk=instance.author_id)
+    if needs_fan_out(followers_count):
+        enqueue_job('fan_out_recipe', recipe_id=instance.pk)
+
+
+@receiver(post_save, sender=Subscription)
+def add_author_to_timeline(sender, instance, created, **kwargs):
+    if created:
+        TimelineEntry.objects.add_author(
+            [instance.subscriber_id], instance.author_id
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_author_from_timeline(sender, instance, **kwargs):
+    TimelineEntry.objects.remove_author(
+        instance.subscriber_id, instance.author_id
+    )
+
+
+def remove_from_recipes(field, pk):
+    Recipe.objects.filter(**{f'{field}__contains': [pk]}).update(
+        **{field: Func(F(field), Value(pk), function='array_remove')}
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+def remove_ingredient_from_recipes(sender, instance, **kwargs):
+    remove_from_recipes('ingredient_ids', instance.pk)
+
+
+@receiver(post_delete, sender=Tag)
+def remove_tag_from_recipes(sender, instance, **kwargs):
+    remove_from_recipes('tag_ids', instance.pk)
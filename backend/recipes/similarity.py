@@ -0,0 +1,148 @@
+import heapq
+from array import array
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .catalog import iter_batches
+from .models import IngredientAmount, Recipe, RecipeSimilarity
+
+SIMILAR_RECIPES_LIMIT = 10
+SIMILARITY_BATCH_SIZE = 1000
+SIMILARITY_CANDIDATES = 500
+SIMILARITY_MAX_SHARE = 0.2
+
+
+def jaccard(common, size, other_size):
+    return common / (size + other_size - common)
+
+
+def load_recipe_ingredients(chunk_size=SIMILARITY_BATCH_SIZE):
+    recipes = {}
+    postings = defaultdict(lambda: array('q'))
+    rows = (
+        IngredientAmount.objects.order_by('recipe_id', 'ingredient_id')
+        .distinct().values_list('recipe_id', 'ingredient_id')
+    )
+    for recipe_id, ingredient_id in rows.iterator(chunk_size=chunk_size):
+        recipes.setdefault(recipe_id, array('q')).append(ingredient_id)
+        postings[ingredient_id].append(recipe_id)
+    return recipes, postings
+
+
+def get_max_postings(recipes_count, max_share):
+    return max(int(recipes_count * max_share), 1)
+
+
+def find_neighbours(recipe_id, recipes, postings, limit, max_postings):
+    ingredients = recipes[recipe_id]
+    common = defaultdict(int)
+    for ingredient_id in ingredients:
+        posting = postings[ingredient_id]
+        if len(posting) > max_postings:
+            continue
+        for other_id in posting:
+            common[other_id] += 1
+    common.pop(recipe_id, None)
+    return heapq.nlargest(limit, (
+        (jaccard(count, len(ingredients), len(recipes[other_id])), other_id)
+        for other_id, count in common.items()
+    ))
+
+
+def build_rows(recipe_id, neighbours):
+    return [
+        RecipeSimilarity(
+            recipe_id=recipe_id, similar_id=other_id, score=score, rank=rank
+        )
+        for rank, (score, other_id) in enumerate(neighbours, start=1)
+    ]
+
+
+def rebuild_similarities(limit=SIMILAR_RECIPES_LIMIT,
+                         max_share=SIMILARITY_MAX_SHARE,
+                         batch_size=SIMILARITY_BATCH_SIZE):
+    recipes, postings = load_recipe_ingredients(batch_size)
+    max_postings = get_max_postings(len(recipes), max_share)
+    for recipe_ids in iter_batches(recipes, batch_size):
+        rows = []
+        for recipe_id in recipe_ids:
+            rows.extend(build_rows(recipe_id, find_neighbours(
+                recipe_id, recipes, postings, limit, max_postings
+            )))
+        with transaction.atomic():
+            RecipeSimilarity.objects.filter(recipe_id__in=recipe_ids).delete()
+            RecipeSimilarity.objects.bulk_create(rows)
+    return len(recipes)
+
+
+def get_ingredient_counts(recipe_ids):
+    return dict(
+        IngredientAmount.objects.filter(recipe_id__in=recipe_ids)
+        .order_by().values('recipe_id')
+        .annotate(total=Count('ingredient_id', distinct=True))
+        .values_list('recipe_id', 'total')
+    )
+
+
+def is_too_common(ingredient_id, max_postings):
+    return Recipe.objects.filter(
+        ingredient_ids__contains=[ingredient_id]
+    )[:max_postings + 1].count() > max_postings
+
+
+@transaction.atomic
+def update_recipe_similarities(recipe_id, limit=SIMILAR_RECIPES_LIMIT,
+                               max_share=SIMILARITY_MAX_SHARE):
+    ingredient_ids = set(
+        IngredientAmount.objects.filter(recipe_id=recipe_id)
+        .values_list('ingredient_id', flat=True)
+    )
+    max_postings = get_max_postings(
+        Recipe.objects.exclude(ingredient_ids=[]).count(), max_share
+    )
+    rare_ids = [
+        ingredient_id for ingredient_id in ingredient_ids
+        if not is_too_common(ingredient_id, max_postings)
+    ]
+    candidates = dict(
+        IngredientAmount.objects.filter(ingredient_id__in=rare_ids)
+        .exclude(recipe_id=recipe_id).order_by().values('recipe_id')
+        .annotate(common=Count('ingredient_id', distinct=True))
+        .order_by('-common').values_list('recipe_id', 'common')
+        [:SIMILARITY_CANDIDATES]
+    )
+    sizes = get_ingredient_counts(candidates)
+    scores = {
+        other_id: jaccard(common, len(ingredient_ids), sizes[other_id])
+        for other_id, common in candidates.items()
+    }
+    neighbours = heapq.nlargest(
+        limit, ((score, other_id) for other_id, score in scores.items())
+    )
+    existing = defaultdict(dict)
+    for owner_id, other_id, score in (
+        RecipeSimilarity.objects
+        .filter(recipe_id__in=scores).exclude(similar_id=recipe_id)
+        .values_list('recipe_id', 'similar_id', 'score')
+    ):
+        existing[owner_id][other_id] = score
+    rows = build_rows(recipe_id, neighbours)
+    changed = []
+    for other_id, score in scores.items():
+        others = existing[other_id]
+        if len(others) >= limit and score <= min(others.values()):
+            continue
+        others[recipe_id] = score
+        changed.append(other_id)
+        rows.extend(build_rows(other_id, heapq.nlargest(
+            limit, ((value, key) for key, value in others.items())
+        )))
+    RecipeSimilarity.objects.filter(
+        recipe_id__in=[recipe_id, *changed]
+    ).delete()
+    RecipeSimilarity.objects.filter(similar_id=recipe_id).exclude(
+        recipe_id__in=changed
+    ).delete()
+    RecipeSimilarity.objects.bulk_create(rows)
@@ -0,0 +1,99 @@
+import io
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from users.models import User
+
+from .images import IMAGE_VARIANTS, build_image_variants
+from .models import Ingredient, IngredientAmount, Recipe, RecipeSimilarity
+from .similarity import rebuild_similarities, update_recipe_similarities
+
+INGREDIENT_SETS = (
+    (0, 1, 2), (0, 1, 3), (0, 2, 3), (0, 4, 5), (0, 4, 6),
+    (0, 5, 6), (0, 1, 4), (0, 2, 5), (0, 3, 6), (0, 7),
+)
+
+
+class IngredientOverlapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='similar@example.com', username='similar',
+            first_name='Автор', last_name='Тестовый', password='pass'
+        )
+        ingredients = list(Ingredient.objects.order_by('id')[:8])
+        cls.recipes = []
+        for number, indexes in enumerate(INGREDIENT_SETS):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}',
+                image='recipes/test.png', description='Описание',
+                cooking_time=10,
+                ingredient_ids=sorted(ingredients[i].id for i in indexes)
+            )
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(
+                    recipe=recipe, ingredient=ingredients[i], amount=1
+                )
+                for i in indexes
+            )
+            cls.recipes.append(recipe)
+
+    def get_similarities(self):
+        return set(RecipeSimilarity.objects.values_list(
+            'recipe_id', 'similar_id', 'rank'
+        ))
+
+    def test_incremental_update_matches_rebuild(self):
+        rebuild_similarities(limit=3, max_share=0.5)
+        rebuilt = self.get_similarities()
+        RecipeSimilarity.objects.all().delete()
+        for recipe in self.recipes:
+            update_recipe_similarities(recipe.id, limit=3, max_share=0.5)
+        self.assertEqual(self.get_similarities(), rebuilt)
+
+    def test_common_ingredient_is_ignored(self):
+        update_recipe_similarities(self.recipes[-1].id, max_share=0.5)
+        self.assertFalse(RecipeSimilarity.objects.filter(
+            recipe=self.recipes[-1]
+        ).exists())
+
+    def test_match_pantry_with_self_join(self):
+        pantry = set(self.recipes[1].ingredient_ids)
+        rebuild_similarities(limit=3, max_share=0.5)
+        recipes = (
+            Recipe.objects.filter(similar_to__recipe__name='Рецепт 1')
+            .match_pantry(sorted(pantry))
+        )
+        self.assertTrue(recipes)
+        for recipe in recipes:
+            matched = len(pantry & set(recipe.ingredient_ids))
+            self.assertEqual(recipe.matched_count, matched)
+            self.assertEqual(
+                recipe.missing_count, len(recipe.ingredient_ids) - matched
+            )
+
+
+class ImageVariantsTests(TestCase):
+
+    def test_source_file_is_closed(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'PNG')
+        author = User.objects.create_user(
+            email='images@example.com', username='images',
+            first_name='Автор', last_name='Тестовый', password='pass'
+        )
+        recipe = Recipe(author=author, name='Рецепт',
+                        description='Описание', cooking_time=10)
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                recipe.image.save(
+                    'source.png', ContentFile(buffer.getvalue()), save=False
+                )
+                recipe.image.close()
+                variants, placeholder = build_image_variants(recipe.image)
+        self.assertTrue(recipe.image.closed)
+        self.assertEqual(variants.keys(), IMAGE_VARIANTS.keys())
+        self.assertTrue(placeholder.startswith('data:image/jpeg;base64,'))
@@ -0,0 +1,238 @@
+import base64
+import hashlib
+import mimetypes
+import shutil
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from users.models import User
+
+from .catalog import bump_catalog_version, iter_batches, load_ingredients
+from .images import inspect_image
+from .jobs import enqueue_jobs, needs_fan_out
+from .models import (Ingredient, IngredientAmount, Recipe, Tag, TagRecipe,
+                     change_counter)
+
+TRANSFER_BATCH_SIZE = 500
+
+
+def export_recipes(dump_image, chunk_size=TRANSFER_BATCH_SIZE):
+    recipes = Recipe.objects.add_read_relations().order_by('pk')
+    for recipe in recipes.iterator(chunk_size=chunk_size):
+        yield {
+            'name': recipe.name,
+            'description': recipe.description,
+            'cooking_time': recipe.cooking_time,
+            'pub_date': recipe.pub_date.isoformat(),
+            'author': recipe.author.email,
+            'image': dump_image(recipe) if recipe.image else '',
+            'tags': [tag.slug for tag in recipe.tags.all()],
+            'ingredients': [
+                {
+                    'name': amount.ingredient.name,
+                    'measurement_unit': amount.ingredient.measurement_unit,
+                    'amount': amount.amount,
+                }
+                for amount in recipe.ingredientrec.all()
+            ],
+        }
+
+
+def encode_image(recipe):
+    media_type = mimetypes.guess_type(recipe.image.name)[0]
+    with recipe.image.open('rb') as file:
+        encoded = base64.b64encode(file.read()).decode()
+    return f'data:{media_type};base64,{encoded}'
+
+
+def decode_image(value):
+    encoded = value.split(';base64,')[-1]
+    if len(encoded) * 3 // 4 > settings.RECIPE_IMAGE_MAX_SIZE:
+        raise ValueError(
+            'Размер изображения не должен превышать '
+            f'{settings.RECIPE_IMAGE_MAX_SIZE} байт.'
+        )
+    return base64.b64decode(encoded)
+
+
+class ImageDirectory:
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def dump(self, recipe):
+        name = Path(recipe.image.name).name
+        if recipe.image_hash:
+            name = recipe.image_hash + Path(name).suffix
+        target = self.path / name
+        if not target.exists():
+            with recipe.image.open('rb') as source, open(target, 'wb') as file:
+                shutil.copyfileobj(source, file)
+        return name
+
+    def load(self, name):
+        return (self.path / Path(name).name).read_bytes()
+
+
+class RecipeImporter:
+
+    def __init__(self, load_image, batch_size=TRANSFER_BATCH_SIZE,
+                 follow_up_jobs=True):
+        self.load_image = load_image
+        self.batch_size = batch_size
+        self.follow_up_jobs = follow_up_jobs
+        self.tags = {}
+        self.ingredients = {}
+        self.imported = 0
+        self.skipped = 0
+        self.catalog_changed = False
+
+    @transaction.atomic
+    def run(self, records):
+        for batch in iter_batches(records, self.batch_size):
+            self.import_batch(batch)
+        if self.catalog_changed:
+            bump_catalog_version()
+        return self.imported, self.skipped
+
+    def resolve_tags(self, records):
+        slugs = {slug for record in records for slug in record['tags']}
+        missing = slugs - self.tags.keys()
+        if missing:
+            self.tags.update(
+                Tag.objects.filter(slug__in=missing).values_list('slug', 'id')
+            )
+
+    def fetch_ingredients(self, keys):
+        for pk, name, measurement_unit in Ingredient.objects.filter(
+            name__in={name for name, _ in keys},
+            measurement_unit__in={unit for _, unit in keys}
+        ).values_list('id', 'name', 'measurement_unit'):
+            self.ingredients[name, measurement_unit] = pk
+
+    def resolve_ingredients(self, records):
+        keys = {
+            (item['name'], item['measurement_unit'])
+            for record in records for item in record['ingredients']
+        }
+        missing = keys - self.ingredients.keys()
+        if missing:
+            self.fetch_ingredients(missing)
+            missing -= self.ingredients.keys()
+        if missing:
+            load_ingredients(Ingredient, missing)
+            self.fetch_ingredients(missing)
+            self.catalog_changed = True
+
+    def store_image(self, value, stored):
+        content = self.load_image(value)
+        suffix = inspect_image(content)
+        image_hash = hashlib.sha256(content).hexdigest()
+        if image_hash not in stored:
+            stored[image_hash] = (
+                Recipe.objects.filter(image_hash=image_hash)
+                .values_list('image', flat=True).first()
+                or default_storage.save(
+                    Recipe._meta.get_field('image').generate_filename(
+                        None, image_hash + suffix
+                    ),
+                    ContentFile(content)
+                )
+            )
+        return stored[image_hash], image_hash
+
+    def import_batch(self, records):
+        authors = User.objects.in_bulk(
+            {record['author'] for record in records}, field_name='email'
+        )
+        self.resolve_tags(records)
+        self.resolve_ingredients(records)
+        stored = {}
+        recipes = []
+        imported = []
+        for record in records:
+            author = authors.get(record['author'])
+            if author is None:
+                self.skipped += 1
+                continue
+            recipe = Recipe(
+                author=author,
+                name=record['name'],
+                description=record['description'],
+                cooking_time=record['cooking_time'],
+                ingredient_ids=sorted({
+                    self.ingredients[item['name'], item['measurement_unit']]
+                    for item in record['ingredients']
+                }),
+                tag_ids=sorted({
+                    self.tags[slug] for slug in record['tags']
+                    if slug in self.tags
+                }),
+            )
+            if record['image']:
+                recipe.image, recipe.image_hash = self.store_image(
+                    record['image'], stored
+                )
+            recipes.append(recipe)
+            imported.append(record)
+        processed = {
+            image_hash: (variants, placeholder)
+            for image_hash, variants, placeholder in (
+                Recipe.objects.filter(image_hash__in=stored)
+                .exclude(image_variants={})
+                .values_list('image_hash', 'image_variants',
+                             'image_placeholder')
+            )
+        }
+        for recipe in recipes:
+            if recipe.image_hash in processed:
+                recipe.image_variants, recipe.image_placeholder = (
+                    processed[recipe.image_hash]
+                )
+        Recipe.objects.bulk_create(recipes)
+        for recipe, record in zip(recipes, imported):
+            recipe.pub_date = parse_datetime(record['pub_date'])
+        Recipe.objects.bulk_update(recipes, ['pub_date'])
+        for author_id, count in Counter(
+            recipe.author_id for recipe in recipes
+        ).items():
+            User.objects.filter(pk=author_id).update(
+                **change_counter('recipes_count', count)
+            )
+        TagRecipe.objects.bulk_create([
+            TagRecipe(recipe=recipe, tag_id=tag_id)
+            for recipe in recipes for tag_id in recipe.tag_ids
+        ])
+        IngredientAmount.objects.bulk_create([
+            IngredientAmount(
+                recipe=recipe,
+                ingredient_id=self.ingredients[
+                    item['name'], item['measurement_unit']
+                ],
+                amount=item['amount']
+            )
+            for recipe, record in zip(recipes, imported)
+            for item in record['ingredients']
+        ])
+        self.imported += len(recipes)
+        if self.follow_up_jobs:
+            self.enqueue_follow_up_jobs(recipes)
+
+    def enqueue_follow_up_jobs(self, recipes):
+        enqueue_jobs('process_recipe_image', [
+            {'recipe_id': recipe.pk}
+            for recipe in recipes if recipe.image and not recipe.image_variants
+        ])
+        enqueue_jobs('fan_out_recipe', [
+            {'recipe_id': recipe.pk} for recipe in recipes
+            if needs_fan_out(recipe.author.followers_count)
+        ])
+        enqueue_jobs('update_similar_recipes', [
+            {'recipe_id': recipe.pk} for recipe in recipes
+        ])